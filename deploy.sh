@@ -1,4 +1,13 @@
 uv run manage.py makemigrations --noinput &&
+# Гейт: горячие запросы идут по индексам (тестовая БД — SQLite в памяти)
+DB_ENGINE=django.db.backends.sqlite3 uv run manage.py test django_stars.stars_app.tests --noinput &&
 uv run manage.py collectstatic --noinput &&
+# Повторяющиеся ref_alias не дадут создать уникальный индекс (после первого раза — no-op)
+uv run manage.py dedupe_ref_aliases &&
 uv run manage.py migrate --noinput &&
+# Сводки ReferralStats для рефоводов, у которых их ещё нет (после первого раза — no-op)
+uv run manage.py rebuild_referral_stats --missing &&
+# Сроки гостевых сессий, созданных до появления expires_at, — до старта
+# guest_cleanup_worker, иначе он деактивирует их все сразу (после первого раза — no-op)
+uv run manage.py cleanup_guests --backfill-expiry &&
 pm2 start ecosystem.config.js
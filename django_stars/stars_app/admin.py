@@ -7,6 +7,7 @@ from django_stars.stars_app.models import (
     PaymentSystem,
     Payment,
     PaymentMethod,
+    PaymentWebhook,
     TonTransaction,
     Referral,
 )
@@ -47,6 +48,7 @@ class OrderAdmin(admin.ModelAdmin):
         "recipient_username",
     )
     list_filter = ("type", "status", "created_at")
+    readonly_fields = ("referrals_reward", "referrals_rewarded")
 
 
 @admin.register(PaymentSystem)
@@ -70,6 +72,14 @@ class PaymentMethodAdmin(admin.ModelAdmin):
     search_fields = ("name", "system__name")
 
 
+@admin.register(PaymentWebhook)
+class PaymentWebhookAdmin(admin.ModelAdmin):
+    list_display = ("id", "provider", "payment_id", "transitioned", "created_at")
+    search_fields = ("payment_id", "provider_ref")
+    list_filter = ("provider", "transitioned")
+    ordering = ("-id",)
+
+
 @admin.register(TonTransaction)
 class TonTransactionAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "source", "hash", "amount", "currency")
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StarsAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "django_stars.stars_app"
+
+    def ready(self):
+        from django_stars.stars_app import signals  # noqa: F401
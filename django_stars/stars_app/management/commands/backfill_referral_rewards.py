@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from integrations.payments.rewards import backfill_rewards
+
+
+class Command(BaseCommand):
+    help = "Начисляет реферальные вознаграждения по завершённым заказам без начислений."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--start-id", type=int, default=0)
+
+    def handle(self, *args, **options):
+        processed, accrued = backfill_rewards(
+            options["batch_size"], options["start_id"]
+        )
+        self.stdout.write(f"Orders: {processed}, accrued: {accrued}")
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from django_stars.stars_app.query_plans import explain, full_scans, hot_queries
+
+
+class Command(BaseCommand):
+    help = (
+        "Снимает EXPLAIN горячих запросов и завершается с ошибкой, если где-то "
+        "полное сканирование таблицы. Запускать перед деплоем на БД со "
+        "статистикой, близкой к продовой: на пустых таблицах MySQL может "
+        "выбрать полный скан и при наличии индекса."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="Только эти запросы")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ("sqlite", "mysql"):
+            raise CommandError(f"Unsupported database: {connection.vendor}")
+        failed = {}
+        for name, qs in hot_queries().items():
+            if options["names"] and name not in options["names"]:
+                continue
+            plan = explain(qs)
+            if options["verbosity"] > 1:
+                self.stdout.write(f"--- {name}\n{plan}")
+            if scans := full_scans(plan):
+                failed[name] = scans
+                self.stdout.write(self.style.ERROR(f"FULL SCAN {name}: {scans}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok {name}"))
+        if failed:
+            raise CommandError(f"Full table scans in: {', '.join(failed)}")
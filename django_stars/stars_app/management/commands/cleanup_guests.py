@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from fastapi_stars.utils.guests import backfill_guest_expiry, cleanup_guest_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Деактивирует истёкшие гостевые сессии и удаляет неактивные без заказов: "
+        "истёкшие более grace-days дней назад и уже закреплённые за пользователем. "
+        "По расписанию то же делает guest_cleanup_worker (run_threads.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grace-days", type=int, default=14)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--sleep", type=float, default=0.1, help="Пауза между батчами, сек"
+        )
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument(
+            "--backfill-expiry",
+            action="store_true",
+            help="Только проставить сроки сессиям, созданным до появления "
+            "expires_at (деплой, до запуска воркеров)",
+        )
+
+    def handle(self, *args, **options):
+        if options["backfill_expiry"]:
+            updated = backfill_guest_expiry(options["batch_size"])
+            self.stdout.write(f"Backfilled: {updated}")
+            return
+        deactivated, deleted = cleanup_guest_sessions(
+            grace_days=options["grace_days"],
+            batch_size=options["batch_size"],
+            pause=options["sleep"],
+            dry_run=options["dry_run"],
+        )
+        self.stdout.write(f"Deactivated: {deactivated}")
+        self.stdout.write(f"Deleted: {deleted}")
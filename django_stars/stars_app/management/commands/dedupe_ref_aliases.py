@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Min
+
+from django_stars.stars_app.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Снимает повторяющиеся ref_alias перед миграцией с уникальным индексом: "
+        "алиас остаётся у самого раннего пользователя (наименьший id), у остальных "
+        "обнуляется; пустые алиасы тоже обнуляются. Повторный запуск — no-op."
+    )
+
+    def handle(self, *args, **options):
+        # Только id и ref_alias: команда идёт до migrate, других новых колонок
+        # в таблице ещё может не быть
+        cleared = User.objects.filter(ref_alias="").update(ref_alias=None)
+        duplicates = (
+            User.objects.filter(ref_alias__isnull=False)
+            .values("ref_alias")
+            .annotate(count=Count("id"), keep=Min("id"))
+            .filter(count__gt=1)
+        )
+        for row in duplicates:
+            cleared += (
+                User.objects.filter(ref_alias=row["ref_alias"])
+                .exclude(id=row["keep"])
+                .update(ref_alias=None)
+            )
+        self.stdout.write(f"Cleared: {cleared}")
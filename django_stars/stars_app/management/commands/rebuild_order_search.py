@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from django_stars.stars_app.models import Order
+from django_stars.stars_app.search import index_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет recipient_username_lower и пересобирает триграммы получателей "
+        "для поиска в /users/orders (батчами по id)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--start-id", type=int, default=0)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = options["start_id"]
+        orders_done = trigrams_done = 0
+        while True:
+            orders = list(
+                Order.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .only("id", "user_id", "recipient_username")[:batch_size]
+            )
+            if not orders:
+                break
+            for order in orders:
+                order.recipient_username_lower = (
+                    order.recipient_username or ""
+                ).lower()[:64]
+            with transaction.atomic():
+                Order.objects.bulk_update(orders, ["recipient_username_lower"])
+                trigrams_done += index_orders(orders)
+            orders_done += len(orders)
+            last_id = orders[-1].id
+            self.stdout.write(f"Indexed up to #{last_id}")
+        self.stdout.write(f"Orders: {orders_done}, trigrams: {trigrams_done}")
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from django_stars.stars_app.models import User
+from django_stars.stars_app.referrals import ensure_stats, rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает ReferralStats по таблице Referral батчами по пользователям."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Только пользователи без сводки; существующие не пересчитываются",
+        )
+        parser.add_argument("users", nargs="*", type=int, help="Только эти id")
+
+    def handle(self, *args, **options):
+        if options["users"]:
+            rebuild_stats(options["users"])
+            self.stdout.write(f"Rebuilt: {len(options['users'])}")
+            return
+        referrers = User.objects.filter(referrals_made__isnull=False)
+        if options["missing"]:
+            referrers = referrers.filter(referral_stats__isnull=True)
+        rebuild = ensure_stats if options["missing"] else rebuild_stats
+        last_id = 0
+        rebuilt = 0
+        while user_ids := list(
+            referrers.filter(id__gt=last_id)
+            .distinct()
+            .order_by("id")
+            .values_list("id", flat=True)[: options["batch_size"]]
+        ):
+            rebuild(user_ids)
+            rebuilt += len(user_ids)
+            last_id = user_ids[-1]
+        self.stdout.write(f"Rebuilt: {rebuilt}")
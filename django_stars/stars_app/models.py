@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class User(models.Model):
@@ -30,6 +31,7 @@ class User(models.Model):
         max_length=64,
         null=True,
         blank=True,
+        unique=True,
         default=None,
         verbose_name="Алиас реферера",
         help_text="Псевдоним реферальной ссылки",
@@ -79,11 +81,51 @@ class Referral(models.Model):
         verbose_name_plural = "Рефералы"
         verbose_name = "Реферал"
         unique_together = ("referrer", "referred")
+        indexes = [
+            # /users/referrals: WHERE referrer ORDER BY level, -id
+            models.Index(fields=["referrer", "level", "-id"]),
+        ]
+
+    # Рефовод на момент загрузки: правка в админке пересчитывает и его сводку
+    loaded_referrer_id: int | None = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_referrer_id = instance.__dict__.get("referrer_id")
+        return instance
 
     def __str__(self):
         return f"{self.referrer.wallet_address} -> {self.referred.wallet_address}"
 
 
+class ReferralStats(models.Model):
+    """Сводка по рефералам пользователя; ведётся вместе с `Referral`."""
+
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="referral_stats",
+        verbose_name="Рефовод",
+    )
+    level_1 = models.PositiveIntegerField(default=0, verbose_name="Рефералов 1 уровня")
+    level_2 = models.PositiveIntegerField(default=0, verbose_name="Рефералов 2 уровня")
+    level_3 = models.PositiveIntegerField(default=0, verbose_name="Рефералов 3 уровня")
+    total_profit = models.FloatField(
+        default=0,
+        verbose_name="Доход с рефералов",
+        help_text="Сумма Referral.profit по всем рефералам пользователя",
+    )
+
+    class Meta:
+        verbose_name_plural = "Сводки по рефералам"
+        verbose_name = "Сводка по рефералам"
+
+    def __str__(self):
+        return f"#{self.user_id}"
+
+
 class GuestSession(models.Model):
     id = models.UUIDField(
         primary_key=True,
@@ -99,10 +141,39 @@ class GuestSession(models.Model):
         verbose_name="Закреплён за пользователем",
         help_text="Пользователь, к которому привязана эта гостевая сессия",
     )
+    # Не auto_now_add: поле добавлено к существующей таблице, а makemigrations
+    # на деплое неинтерактивный и не может спросить значение для старых строк
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        verbose_name="Дата создания",
+        help_text="Дата и время первого заказа гостя",
+    )
+    expires_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Истекает",
+        help_text="Окончание срока действия гостевого токена",
+    )
+    last_seen = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Последняя активность",
+        help_text="Дата и время последнего заказа гостя",
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name="Активна",
+        help_text="Сессия не истекла и не закреплена за пользователем",
+    )
 
     class Meta:
         verbose_name_plural = "Гостевые сессии"
         verbose_name = "Гостевая сессия"
+        indexes = [
+            # expires_at первым: SQLite пишет is_active=True голой колонкой,
+            # и индекс, начинающийся с is_active, не используется
+            models.Index(fields=["expires_at", "is_active"]),
+            models.Index(fields=["last_seen"]),
+        ]
 
 
 class Price(models.Model):
@@ -232,11 +303,25 @@ class Order(models.Model):
         max_length=500,
         help_text="Юзернейм получателя",
     )
+    recipient_username_lower = models.CharField(
+        blank=True,
+        default="",
+        editable=False,
+        verbose_name="Никнейм получателя (поиск)",
+        max_length=64,
+        help_text="Юзернейм получателя в нижнем регистре, заполняется при сохранении",
+    )
     referrals_reward = models.FloatField(
         default=0,
         verbose_name="Доход рефералов",
         help_text="Вознаграждение за реферальную систему по заказу",
     )
+    referrals_rewarded = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name="Реферальные начислены",
+        help_text="Вознаграждения рефоводам по заказу уже начислены",
+    )
     msg_hash = models.CharField(
         blank=True,
         null=True,
@@ -298,8 +383,50 @@ class Order(models.Model):
         indexes = [
             models.Index(fields=["user", "status"]),
             models.Index(fields=["status", "created_at"]),
+            models.Index(fields=["user", "recipient_username_lower"]),
+            # Забор заказов воркерами (status + type) и /info/project_stats
+            models.Index(fields=["status", "type", "created_at"]),
         ]
 
+    # Пишет только движок начислений (integrations.payments.rewards) условным
+    # UPDATE; полный save() устаревшего экземпляра не должен их затирать
+    REWARD_FIELDS = frozenset(("referrals_reward", "referrals_rewarded"))
+
+    # Получатель, по которому построены триграммы; None — неизвестно
+    _indexed_recipient: str | None = None
+    recipient_changed = False
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._indexed_recipient = instance.__dict__.get("recipient_username_lower")
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.recipient_username_lower = (self.recipient_username or "").lower()[:64]
+        if (
+            kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and not self._state.adding
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.REWARD_FIELDS
+                and field.attname not in deferred
+            ]
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "recipient_username" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "recipient_username_lower"}
+        # Читает сигнал index_order_recipient: триграммы устарели
+        self.recipient_changed = (
+            update_fields is None or "recipient_username" in update_fields
+        ) and self.recipient_username_lower != self._indexed_recipient
+        super().save(*args, **kwargs)
+        self._indexed_recipient = self.recipient_username_lower
+
     def get_type_display(self):
         return (
             self.Type(self.type).label
@@ -311,6 +438,35 @@ class Order(models.Model):
         return f"#{self.id} {self.get_type_display()}"
 
 
+class OrderRecipientTrigram(models.Model):
+    """Триграммы `recipient_username_lower` для поиска подстроки по заказам."""
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name="recipient_trigrams",
+        verbose_name="Заказ",
+    )
+    user = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+        help_text="Копия Order.user: поиск идёт по индексу (user, trigram)",
+    )
+    trigram = models.CharField(max_length=3, verbose_name="Триграмма")
+
+    class Meta:
+        verbose_name_plural = "Триграммы получателей"
+        verbose_name = "Триграмма получателя"
+        unique_together = ("order", "trigram")
+        indexes = [models.Index(fields=["user", "trigram"])]
+
+    def __str__(self):
+        return f"#{self.order_id} {self.trigram}"
+
+
 class PaymentSystem(models.Model):
     class Names(models.TextChoices):
         CRYPTOPAY = "cryptopay", "CryptoPay"
@@ -475,12 +631,55 @@ class Payment(models.Model):
             models.Index(fields=["status"]),
             models.Index(fields=["status", "created_at"]),
             models.Index(fields=["status", "created_at", "method"]),
+            # JOIN Order → Payment с условием на статус (воркеры, депозит в /me)
+            models.Index(fields=["order", "status"]),
+            # /users/payments: по заказам пользователя, ORDER BY -created_at, -id
+            models.Index(fields=["order", "-created_at", "-id"]),
         ]
 
     def __str__(self):
         return f"#{self.id}"
 
 
+class PaymentWebhook(models.Model):
+    provider = models.CharField(
+        max_length=100,
+        choices=PaymentSystem.Names.choices,
+        verbose_name="Платёжная система",
+        help_text="Платёжная система, приславшая уведомление",
+    )
+    payment_id = models.CharField(
+        max_length=64,
+        verbose_name="ID платежа",
+        help_text="ID нашего платежа из уведомления",
+    )
+    provider_ref = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        verbose_name="ID во внешней системе",
+        help_text="Идентификатор счёта/транзакции у платёжной системы",
+    )
+    transitioned = models.BooleanField(
+        default=False,
+        verbose_name="Подтвердил платёж",
+        help_text="Перевело ли это уведомление платёж в статус «Подтверждён»",
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата получения",
+        help_text="Дата и время первого получения уведомления",
+    )
+
+    class Meta:
+        verbose_name_plural = "Уведомления платёжных систем"
+        verbose_name = "Уведомление платёжной системы"
+        unique_together = ("provider", "payment_id")
+
+    def __str__(self):
+        return f"{self.provider} #{self.payment_id}"
+
+
 class TonTransaction(models.Model):
     class Currency(models.TextChoices):
         TON = "TON"
@@ -537,6 +736,8 @@ class TonTransaction(models.Model):
     class Meta:
         verbose_name_plural = "Транзакции"
         verbose_name = "Транзакция"
+        # payment_id индексируется как внешний ключ
+        indexes = [models.Index(fields=["hash"])]
 
     def __str__(self):
         return f"#{self.id} {self.source} - {self.hash}"
@@ -0,0 +1,99 @@
+"""
+Горячие запросы и проверка их планов выполнения.
+
+Используется тестами (`stars_app/tests.py`, гейт перед деплоем) и командой
+`check_query_plans` для проверки на БД с продовой статистикой.
+"""
+
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from django_stars.stars_app.models import (
+    GuestSession,
+    Order,
+    OrderRecipientTrigram,
+    Payment,
+    Referral,
+    TonTransaction,
+)
+
+USER_ID = 1  # значения параметров на план не влияют, важна форма запроса
+
+
+def hot_queries() -> dict:
+    """Горячие запросы API и воркеров в той форме, в которой они выполняются."""
+    visible = ~Q(status__in=(Order.Status.CANCEL, Order.Status.CREATING))
+    return {
+        "users.orders": Order.objects.filter(visible, user_id=USER_ID).order_by("-id")[
+            :11
+        ],
+        "users.orders.cursor": Order.objects.filter(
+            visible, user_id=USER_ID, id__lt=1000
+        ).order_by("-id")[:11],
+        "users.orders.prefix": Order.objects.filter(
+            visible, user_id=USER_ID, recipient_username_lower__startswith="du"
+        ).order_by("-id")[:11],
+        "users.orders.trigrams": OrderRecipientTrigram.objects.filter(
+            user_id=USER_ID, trigram__in=("dur", "uro", "rov")
+        )
+        .values("order_id")
+        .annotate(matched=Count("trigram")),
+        "users.payments": Payment.objects.filter(order__user_id=USER_ID).order_by(
+            "-created_at", "-id"
+        )[:11],
+        "users.me.deposit": Payment.objects.filter(
+            order__user_id=USER_ID, status=Payment.Status.CONFIRMED
+        ).values("sum"),
+        "users.referrals": Referral.objects.filter(referrer_id=USER_ID).order_by(
+            "level", "-id"
+        )[:11],
+        "users.referrals.count": Referral.objects.filter(referrer_id=USER_ID)
+        .values("level")
+        .annotate(count=Count("id")),
+        "info.project_stats": Order.objects.filter(
+            is_refund=False,
+            status=Order.Status.COMPLETED,
+            type=Order.Type.STARS,
+            created_at__gte=timezone.now() - timedelta(days=1),
+        ).values("amount"),
+        "workers.send_transaction": Order.objects.filter(
+            status=Order.Status.CREATED,
+            payment__status=Payment.Status.CONFIRMED,
+            type__in=(Order.Type.PREMIUM, Order.Type.STARS, Order.Type.TON),
+        ),
+        "workers.gifts": Order.objects.filter(
+            status=Order.Status.CREATED,
+            type=Order.Type.GIFT_REGULAR,
+            payment__status=Payment.Status.CONFIRMED,
+        ),
+        "workers.check_transaction": Order.objects.filter(
+            status=Order.Status.BLOCKCHAIN_WAITING
+        ),
+        "ton_deposit.hash": TonTransaction.objects.filter(hash="0" * 64),
+        "ton_deposit.payment": TonTransaction.objects.filter(payment__id="0"),
+        "cleanup_guests": GuestSession.objects.filter(
+            is_active=True, expires_at__lt=timezone.now()
+        ),
+    }
+
+
+def full_scans(plan: str) -> list[str]:
+    """Строки плана с полным сканированием таблицы."""
+    if connection.vendor == "sqlite":
+        return [
+            line.strip()
+            for line in plan.splitlines()
+            if re.search(r"\bSCAN \w+$", line.strip())
+        ]
+    if connection.vendor == "mysql":
+        return re.findall(r'"table_name": "(\w+)",\s*"access_type": "ALL"', plan)
+    raise ValueError(f"Unsupported database: {connection.vendor}")
+
+
+def explain(qs) -> str:
+    """EXPLAIN запроса; для MySQL — в JSON, где виден `access_type`."""
+    return qs.explain(**({"format": "JSON"} if connection.vendor == "mysql" else {}))
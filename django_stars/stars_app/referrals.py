@@ -0,0 +1,128 @@
+"""
+Сводки по рефералам (`ReferralStats`).
+
+Счётчики по уровням и доход обновляются атомарными `UPDATE ... SET x = x + n`
+в той же транзакции, что и изменения `Referral`, поэтому /users/referrals/count
+читает одну строку вместо GROUP BY и SUM по всем рефералам. Поштучные правки
+`Referral` (админка, каскадное удаление) пересчитывают сводки через сигнал.
+"""
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+
+from django_stars.stars_app.models import Referral, ReferralStats, User
+
+LEVELS = (1, 2, 3)  # по полям level_N в ReferralStats
+
+
+def _ensure_rows(user_ids) -> None:
+    ReferralStats.objects.bulk_create(
+        [ReferralStats(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+
+
+def add_referrals(levels: dict[int, int]) -> None:
+    """
+    Учитывает новые связи `Referral`.
+
+    :param levels: {id рефовода: уровень нового реферала у него}
+    """
+    if not levels:
+        return
+    _ensure_rows(levels)
+    updates = {}
+    for level in set(levels.values()):
+        referrers = [user_id for user_id, lvl in levels.items() if lvl == level]
+        updates[f"level_{level}"] = F(f"level_{level}") + Case(
+            When(user_id__in=referrers, then=Value(1)), default=Value(0)
+        )
+    ReferralStats.objects.filter(user_id__in=levels).update(**updates)
+
+
+def increments(key: str, amounts: dict[int, float]) -> Case:
+    """Прибавка для `F(поле) + ...` в одном UPDATE: своя сумма для каждого `key`."""
+    return Case(
+        *(When(**{key: pk}, then=Value(amount)) for pk, amount in amounts.items()),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def add_profits(profits: dict[int, float]) -> None:
+    """
+    Учитывает начисления рефоводам (вместе с `Referral.profit`).
+
+    :param profits: {id рефовода: сумма начисления}
+    """
+    if not profits:
+        return
+    _ensure_rows(profits)
+    ReferralStats.objects.filter(user_id__in=profits).update(
+        total_profit=F("total_profit") + increments("user_id", profits)
+    )
+
+
+def _aggregate(user_ids) -> dict[int, ReferralStats]:
+    """Сводки пользователей, посчитанные заново по таблице `Referral`."""
+    aggregates = (
+        Referral.objects.filter(referrer_id__in=user_ids)
+        .values("referrer_id")
+        .annotate(
+            total_profit=Sum("profit", default=0),
+            **{
+                f"level_{level}": Count("id", filter=Q(level=level)) for level in LEVELS
+            },
+        )
+    )
+    rows = {user_id: ReferralStats(user_id=user_id) for user_id in user_ids}
+    for row in aggregates:
+        user_id = row.pop("referrer_id")
+        rows[user_id] = ReferralStats(user_id=user_id, **row)
+    return rows
+
+
+def rebuild_stats(user_ids) -> None:
+    """
+    Пересчитывает сводки пользователей по таблице `Referral`.
+
+    Подсчёт и запись — в одной транзакции под блокировкой строк сводок.
+    Инкременты (`add_referrals`, `add_profits`) идут в своих транзакциях после
+    изменения `Referral`: успевшие до блокировки пересчёт дождётся и учтёт,
+    остальные лягут поверх пересчитанных значений.
+    """
+    with transaction.atomic():
+        # Удалённых пользователей (каскад из админки) пропускаем
+        user_ids = list(
+            User.objects.filter(id__in=user_ids).values_list("id", flat=True)
+        )
+        _ensure_rows(user_ids)
+        list(
+            ReferralStats.objects.select_for_update()
+            .filter(user_id__in=user_ids)
+            .values_list("pk", flat=True)
+        )
+        ReferralStats.objects.bulk_update(
+            _aggregate(user_ids).values(),
+            [*(f"level_{level}" for level in LEVELS), "total_profit"],
+        )
+
+
+def ensure_stats(user_ids) -> None:
+    """
+    Создаёт недостающие сводки по таблице `Referral`; существующие не трогает.
+
+    Нужна для пользователей, чьи рефералы появились до `ReferralStats`:
+    деплой заполняет их командой `rebuild_referral_stats --missing`, а
+    /users/referrals/count достраивает строку, если её всё же нет.
+    """
+    existing = set(
+        ReferralStats.objects.filter(user_id__in=user_ids).values_list(
+            "user_id", flat=True
+        )
+    )
+    missing = [user_id for user_id in user_ids if user_id not in existing]
+    if missing:
+        ReferralStats.objects.bulk_create(
+            _aggregate(missing).values(), ignore_conflicts=True
+        )
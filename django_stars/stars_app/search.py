@@ -0,0 +1,53 @@
+"""
+Поиск заказов по юзернейму получателя.
+
+Короткий запрос (до 3 символов) — поиск по префиксу по индексу
+(user, recipient_username_lower). Длинный — поиск подстроки: заказы-кандидаты
+берутся из таблицы триграмм по индексу (user, trigram), затем проверяются
+`LIKE` только среди них, без сканирования всех заказов пользователя.
+"""
+
+from typing import Iterable
+
+from django.db.models import Count, Q
+
+from django_stars.stars_app.models import Order, OrderRecipientTrigram
+
+
+def normalize(query: str) -> str:
+    return query.strip().lstrip("@").lower()
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def recipient_filter(user_id: int, query: str) -> Q | None:
+    """Условие на `Order` для поиска по получателю; None — искать нечего."""
+    query = normalize(query)
+    if not query:
+        return None
+    if len(query) < 3:
+        return Q(recipient_username_lower__startswith=query)
+    grams = trigrams(query)
+    candidates = (
+        OrderRecipientTrigram.objects.filter(user_id=user_id, trigram__in=grams)
+        .values("order_id")
+        .annotate(matched=Count("trigram"))
+        .filter(matched=len(grams))
+        .values("order_id")
+    )
+    return Q(id__in=candidates, recipient_username_lower__contains=query)
+
+
+def index_orders(orders: Iterable[Order]) -> int:
+    """(Пере)строит триграммы заказов; возвращает число записанных строк."""
+    orders = list(orders)
+    OrderRecipientTrigram.objects.filter(order__in=orders).delete()
+    rows = [
+        OrderRecipientTrigram(order_id=order.id, user_id=order.user_id, trigram=gram)
+        for order in orders
+        for gram in trigrams(order.recipient_username_lower)
+    ]
+    OrderRecipientTrigram.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from django_stars.stars_app.models import (
+    Order,
+    PaymentMethod,
+    PaymentSystem,
+    Price,
+    Referral,
+)
+from django_stars.stars_app.search import index_orders
+
+
+@receiver((post_save, post_delete), sender=PaymentMethod)
+@receiver((post_save, post_delete), sender=PaymentSystem)
+def invalidate_cached_model(sender, **kwargs):
+    """Рассылает API/воркерам сигнал перечитать закэшированные данные модели."""
+    from integrations.utils.invalidation import publish_invalidation
+
+    transaction.on_commit(lambda: publish_invalidation(sender._meta.label_lower))
+
+
+@receiver((post_save, post_delete), sender=Price)
+def invalidate_price_table(sender, **kwargs):
+    """Цены премиума изменились — воркер пересоберёт таблицу цен."""
+    from fastapi_stars.utils.quotes import mark_price_table_stale
+
+    transaction.on_commit(mark_price_table_stale)
+
+
+@receiver(post_save, sender=Order)
+def index_order_recipient(sender, instance, created, **kwargs):
+    """Поддерживает триграммы получателя для поиска в /users/orders."""
+    if created or instance.recipient_changed:
+        index_orders([instance])
+
+
+@receiver((post_save, post_delete), sender=Referral)
+def rebuild_referral_stats(sender, instance, **kwargs):
+    """
+    Поштучная правка/удаление `Referral` (админка, каскад) — пересчёт сводок.
+
+    Код приложения меняет `Referral` через bulk_create/update() и ведёт
+    `ReferralStats` сам; эти операции сигналов не шлют.
+    """
+    from django_stars.stars_app.referrals import rebuild_stats
+
+    user_ids = {instance.referrer_id, instance.loaded_referrer_id} - {None}
+    transaction.on_commit(lambda: rebuild_stats(user_ids), robust=True)
+
+
+@receiver(post_save, sender=Order)
+def accrue_referral_rewards(sender, instance, **kwargs):
+    """Заказ завершён — начисляем реферальные после коммита (идемпотентно)."""
+    if instance.status != Order.Status.COMPLETED or instance.referrals_rewarded:
+        return
+    from integrations.payments.rewards import accrue_order_rewards
+
+    def accrue():
+        total = accrue_order_rewards(instance.pk)
+        if total is not None:
+            # save() флаг и сумму не пишет; обновляем, чтобы экземпляр не
+            # запускал повторную (холостую) попытку начисления
+            instance.referrals_rewarded = True
+            instance.referrals_reward = total
+
+    transaction.on_commit(accrue, robust=True)
@@ -1 +1,112 @@
-# Create your tests here.
+import asyncio
+import threading
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, TransactionTestCase
+
+from django_stars.stars_app.models import (
+    Order,
+    OrderRecipientTrigram,
+    Referral,
+    ReferralStats,
+    User,
+)
+from django_stars.stars_app.query_plans import explain, full_scans, hot_queries
+from django_stars.stars_app.search import trigrams
+from fastapi_stars.utils.orm_threads import OrmThreadPool
+
+
+class HotQueryPlansTests(TestCase):
+    """Горячие запросы API и воркеров идут по индексам, без полного скана."""
+
+    def test_no_full_table_scans(self):
+        for name, qs in hot_queries().items():
+            with self.subTest(query=name):
+                self.assertEqual(full_scans(explain(qs)), [])
+
+
+class OrderSearchIndexTests(TestCase):
+    """Триграммы получателя следуют за `recipient_username` при любом save()."""
+
+    def test_plain_save_reindexes_recipient(self):
+        user = User.objects.create(wallet_address="UQ-search-test")
+        order = Order.objects.create(
+            user=user, type=Order.Type.STARS, recipient_username="durov"
+        )
+        order = Order.objects.get(pk=order.pk)
+        order.recipient_username = "Telegram"
+        order.save()
+        indexed = OrderRecipientTrigram.objects.filter(order=order).values_list(
+            "trigram", flat=True
+        )
+        self.assertEqual(set(indexed), trigrams("telegram"))
+
+
+class OrderRewardFlagTests(TestCase):
+    """Полный save() устаревшего экземпляра не сбрасывает флаг начисления."""
+
+    def test_stale_save_keeps_rewarded_flag(self):
+        user = User.objects.create(wallet_address="UQ-reward-test")
+        order = Order.objects.create(user=user, type=Order.Type.STARS)
+        stale = Order.objects.get(pk=order.pk)
+        Order.objects.filter(pk=order.pk).update(
+            referrals_rewarded=True, referrals_reward=1.5
+        )
+        stale.status = Order.Status.ERROR
+        stale.save()
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.ERROR)
+        self.assertTrue(order.referrals_rewarded)
+        self.assertEqual(order.referrals_reward, 1.5)
+
+
+class ReferralStatsSignalTests(TestCase):
+    """Поштучные правки `Referral` (админка) пересчитывают `ReferralStats`."""
+
+    def test_edit_and_delete_rebuild_stats(self):
+        old, new, referred = (
+            User.objects.create(wallet_address=f"UQ-ref-{i}") for i in range(3)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            referral = Referral.objects.create(
+                referrer=old, referred=referred, level=1, profit=2.5
+            )
+        self.assertEqual(ReferralStats.objects.get(user=old).level_1, 1)
+
+        referral = Referral.objects.get(pk=referral.pk)
+        referral.referrer = new
+        with self.captureOnCommitCallbacks(execute=True):
+            referral.save()
+        self.assertEqual(ReferralStats.objects.get(user=old).level_1, 0)
+        stats = ReferralStats.objects.get(user=new)
+        self.assertEqual((stats.level_1, stats.total_profit), (1, 2.5))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            referral.delete()
+        self.assertEqual(ReferralStats.objects.get(user=new).level_1, 0)
+
+
+class OrmThreadPoolTests(TransactionTestCase):
+    """
+    `OrmThreadPool` подменяет поток `ThreadSensitiveContext` через внутренности
+    asgiref — тест ловит их изменение при обновлении зависимости.
+    """
+
+    def test_orm_runs_on_pool_thread(self):
+        pool = OrmThreadPool(1)
+
+        def orm_call():
+            User.objects.count()
+            return threading.current_thread()
+
+        async def request():
+            async with pool.context():
+                return await sync_to_async(orm_call)()
+
+        # Свой event loop, как под uvicorn: async-тест Django работает внутри
+        # async_to_sync, и asgiref отправил бы вызов в его поток, мимо пула
+        first = asyncio.run(request())
+        second = asyncio.run(request())
+        self.assertTrue(first.name.startswith("orm-0"))
+        self.assertIs(first, second)
+        self.assertIsNot(first, threading.current_thread())
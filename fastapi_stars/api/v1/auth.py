@@ -1,8 +1,9 @@
 from typing import Annotated, Optional
 from uuid import uuid4
 
+from asgiref.sync import sync_to_async
 from django.db import transaction
-from django.db.models import Q, F
+from django.db.models import F
 from fastapi import APIRouter, HTTPException, status, Depends, Response
 from fastapi.params import Query
 from pytoniq_core import Address, AddressError
@@ -10,13 +11,12 @@ from tonutils.tonconnect.models import TonProof
 from tonutils.tonconnect.utils import generate_proof_payload
 from tonutils.tonconnect.utils.verifiers import verify_ton_proof
 
-from django_stars.stars_app.models import User, GuestSession, Order, Referral
+from django_stars.stars_app.models import User, GuestSession, Referral
+from django_stars.stars_app.referrals import add_referrals
 from fastapi_stars.api.deps import Principal, current_principal, user_principal
-from fastapi_stars.auth.jwt_utils import (
-    create_guest_token,
-    decode_any,
-    create_user_token,
-)
+from fastapi_stars.auth.jwt_utils import decode_any, token_service
+from fastapi_stars.utils.guests import enqueue_claim
+from fastapi_stars.utils.ref_codes import resolve_ref_code
 from fastapi_stars.schemas.auth import (
     TokenPair,
     RefreshIn,
@@ -24,7 +24,6 @@ from fastapi_stars.schemas.auth import (
     SessionValidation,
     TonConnectProof,
 )
-from fastapi_stars.settings import settings
 
 router = APIRouter()
 
@@ -54,7 +53,8 @@ def _assign_ref_chain_for_new_user(
     Ограничения и защита:
     * Цепочка строится максимум до `max_levels` уровней.
     * Исключаются циклы и самореферал.
-    * Идём по полю `User.referrer` "вверх" по дереву.
+    * Предки реферера берутся одним запросом из его же строк `Referral`
+      (таблица хранит все уровни, а не только прямого рефовода).
 
     :param new_user: Новый пользователь, для которого строится цепочка.
     :param ref_wallet_raw: Адрес (или то, что на него похоже) предполагаемого реферера.
@@ -65,28 +65,63 @@ def _assign_ref_chain_for_new_user(
         return
 
     # Стартовый реферер (уровень 1)
-    current_ref = User.objects.filter(wallet_address=ref_wallet).first()
-    if not current_ref or current_ref == new_user:
+    ref_id = (
+        User.objects.filter(wallet_address=ref_wallet)
+        .values_list("pk", flat=True)
+        .first()
+    )
+    if not ref_id or ref_id == new_user.pk:
         return  # не существует или самореферал — игнорируем
 
-    visited = {new_user.pk}  # защита от циклов
-    level = 1
+    # Рефоводы реферера уровня k становятся рефоводами new_user уровня k + 1
+    levels = {ref_id: 1}
+    ancestors = Referral.objects.filter(
+        referred_id=ref_id, level__lt=max_levels
+    ).values_list("referrer_id", "level")
+    for referrer_id, level in ancestors:
+        if referrer_id != new_user.pk:  # защита от циклов
+            levels.setdefault(referrer_id, level + 1)
+
+    # Пользователь только что создан, поэтому все связи новые (учёт в ReferralStats);
+    # ignore_conflicts + unique_together — защита от гонок
+    Referral.objects.bulk_create(
+        [
+            Referral(referrer_id=referrer_id, referred=new_user, level=level)
+            for referrer_id, level in levels.items()
+        ],
+        ignore_conflicts=True,
+    )
+    add_referrals(levels)
 
-    while current_ref and level <= max_levels:
-        if current_ref.pk in visited or current_ref == new_user:
-            break
-        visited.add(current_ref.pk)
 
-        # Создаём связь, если её нет (unique_together защитит от гонок)
-        Referral.objects.get_or_create(
-            referrer=current_ref,
-            referred=new_user,
-            defaults={"level": level, "profit": 0.0},
-        )
+def _login_user(subject: str, guest_payload: dict) -> User:
+    """
+    Находит/создаёт пользователя по адресу и закрепляет за ним гостевую сессию.
 
-        # Переходим к рефереру текущего реферера (т.е. к "дедушке")
-        current_ref = current_ref.referrer
-        level += 1
+    Выполняется одной транзакцией, поэтому вызывается из async-кода через
+    `sync_to_async`. Заказы гостя переносит после коммита фоновая задача
+    (`guest_claims_worker`), чтобы время логина не зависело от их числа.
+    """
+    with transaction.atomic():
+        user, created = User.objects.get_or_create(wallet_address=subject)
+
+        # Назначаем рефоводов только если это свежая регистрация
+        if created and guest_payload.get("ref"):
+            _assign_ref_chain_for_new_user(
+                new_user=user,
+                ref_wallet_raw=guest_payload["ref"],
+                max_levels=3,
+            )
+
+        # Закрепляем гостевую сессию (строки может и не быть — гость без заказов)
+        sid = guest_payload["sid"]
+        if GuestSession.objects.filter(pk=sid).update(
+            claimed_by_user=user, is_active=False
+        ):
+            # Ошибка Redis не ломает логин: сессию подберёт обход воркера
+            transaction.on_commit(lambda: enqueue_claim(sid, user.pk), robust=True)
+
+    return user
 
 
 @router.post(
@@ -108,7 +143,7 @@ def _assign_ref_chain_for_new_user(
         401: {"description": "Недействительная сессия/тип токена."},
     },
 )
-def tonconnect_login(
+async def tonconnect_login(
     proof: TonConnectProof, principal: Principal = Depends(current_principal)
 ):
     """
@@ -149,43 +184,11 @@ def tonconnect_login(
 
     subject = subject_addr.to_str(is_bounceable=False)
 
-    with transaction.atomic():
-        user, created = User.objects.get_or_create(wallet_address=subject)
-
-        # Назначаем рефоводов только если это свежая регистрация
-        if created and principal["payload"].get("ref"):
-            _assign_ref_chain_for_new_user(
-                new_user=user,
-                ref_wallet_raw=principal["payload"]["ref"],
-                max_levels=3,
-            )
-
-        # Привязываем гостевую сессию и заказы
-        gs = GuestSession.objects.filter(pk=principal["payload"]["sid"]).first()
-        if gs:
-            Order.objects.filter(guest_session=gs).update(user=user, guest_session=None)
-            gs.claimed_by_user = user
-            gs.save(update_fields=("claimed_by_user",))
+    user = await sync_to_async(_login_user)(subject, principal["payload"])
 
     # Выдаём обычные access/refresh
-    return TokenPair(
-        access=create_user_token(
-            str(user.pk),
-            settings.jwt_secret.get_secret_value(),
-            settings.jwt_alg,
-            settings.jwt_access_ttl,
-            "access",
-            user.jwt_epoch,
-        ),
-        refresh=create_user_token(
-            str(user.pk),
-            settings.jwt_secret.get_secret_value(),
-            settings.jwt_alg,
-            settings.jwt_refresh_ttl,
-            "refresh",
-            user.jwt_epoch,
-        ),
-    )
+    access, refresh = token_service.issue_pair(str(user.pk), user.jwt_epoch)
+    return TokenPair(access=access, refresh=refresh)
 
 
 @router.post(
@@ -201,19 +204,17 @@ def tonconnect_login(
         401: {"description": "Неверный тип токена или пользователь не найден."},
     },
 )
-def refresh_tokens(body: RefreshIn):
+async def refresh_tokens(body: RefreshIn):
     """
     Обновляет JWT-токены по действительному refresh-токену.
     """
-    payload = decode_any(
-        body.refresh, settings.jwt_secret.get_secret_value(), settings.jwt_alg
-    )
+    payload = decode_any(body.refresh)
     if payload.get("type") != "refresh":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token type"
         )
     user_id = payload.get("sub")
-    user = User.objects.filter(pk=user_id).first()
+    user = await User.objects.filter(pk=user_id).afirst()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
@@ -222,24 +223,8 @@ def refresh_tokens(body: RefreshIn):
     if payload.get("ep") != user.jwt_epoch:
         raise HTTPException(status_code=401, detail="Token revoked")
 
-    return TokenPair(
-        access=create_user_token(
-            user_id,
-            settings.jwt_secret.get_secret_value(),
-            settings.jwt_alg,
-            settings.jwt_access_ttl,
-            "access",
-            user.jwt_epoch,
-        ),
-        refresh=create_user_token(
-            user_id,
-            settings.jwt_secret.get_secret_value(),
-            settings.jwt_alg,
-            settings.jwt_refresh_ttl,
-            "refresh",
-            user.jwt_epoch,
-        ),
-    )
+    access, refresh = token_service.issue_pair(user_id, user.jwt_epoch)
+    return TokenPair(access=access, refresh=refresh)
 
 
 @router.post(
@@ -254,7 +239,7 @@ def refresh_tokens(body: RefreshIn):
         200: {"description": "Гостевой токен создан."},
     },
 )
-def create_guest(
+async def create_guest(
     ref: Annotated[
         str,
         Query(
@@ -273,19 +258,11 @@ def create_guest(
     """
     if ref:
         ref_addr = _normalize_wallet(ref)
-        ref = ref_addr or ref  # если не адрес, оставляем как есть (возможно, это алиас)
-        ref_user = User.objects.filter(Q(wallet_address=ref) | Q(ref_alias=ref)).first()
-        ref = ref_user.wallet_address if ref_user else None
+        # если не адрес, оставляем как есть (возможно, это алиас)
+        ref = await resolve_ref_code(ref_addr or ref, is_wallet=ref_addr is not None)
     sid = str(uuid4())
     payload_hash = generate_proof_payload()
-    token = create_guest_token(
-        settings.jwt_secret.get_secret_value(),
-        settings.jwt_alg,
-        settings.jwt_guest_ttl,
-        sid,
-        payload_hash,
-        ref,
-    )
+    token = token_service.issue_guest(sid, payload_hash, ref)
     return GuestTokenOut(
         guest=token,
         ton_verify=payload_hash,
@@ -304,7 +281,7 @@ def create_guest(
         401: {"description": "Недействительная сессия."},
     },
 )
-def validate_session(principal: Principal = Depends(current_principal)):
+async def validate_session(principal: Principal = Depends(current_principal)):
     """
     Проверяет токен из авторизации запроса и сообщает его тип.
 
@@ -334,6 +311,8 @@ def validate_session(principal: Principal = Depends(current_principal)):
     summary="Отозвать все ранее выданные токены пользователя",
     description="Инкрементирует jwt_epoch для текущего пользователя; все старые токены становятся недействительными.",
 )
-def revoke_all(principal=Depends(user_principal)):
-    User.objects.filter(pk=principal["user"].pk).update(jwt_epoch=F("jwt_epoch") + 1)
+async def revoke_all(principal=Depends(user_principal)):
+    await User.objects.filter(pk=principal["user"].pk).aupdate(
+        jwt_epoch=F("jwt_epoch") + 1
+    )
     return Response(status_code=204)
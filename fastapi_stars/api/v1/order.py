@@ -1,14 +1,14 @@
 from typing import assert_never
 from uuid import uuid4
 
+from asgiref.sync import sync_to_async
 from fastapi import APIRouter, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from loguru import logger
 from pytoniq_core import Address
-from redis import Redis
 from tonutils.utils import to_nano
 
 from django_stars.stars_app.models import (
-    GuestSession,
     PaymentMethod,
     Order,
     Payment,
@@ -16,20 +16,35 @@ from django_stars.stars_app.models import (
     TonTransaction,
 )
 from fastapi_stars.api.deps import current_principal
+from fastapi_stars.auth.jwt_utils import decode_quote
 from fastapi_stars.schemas.auth import Principal
 from fastapi_stars.schemas.order import OrderIn, OrderResponse, OrderItem
 from fastapi_stars.settings import settings
+from fastapi_stars.utils.guests import touch_guest_session
 from fastapi_stars.utils.prices import get_stars_price, get_premium_price, get_ton_price
+from fastapi_stars.utils.quotes import aget_price_table
+from fastapi_stars.utils.recipients import cached_recipient, resolve_recipient
 from fastapi_stars.utils.tc_messages import build_tonconnect_message
-from integrations.Currencies import TON
 from integrations.Merchants.utils import generate_pay_link
 from integrations.fragment import FragmentAPI
 from integrations.gifts import get_gift_sender
-from integrations.telegram_bot import bot
 from integrations.wallet.helpers import get_wallet
 
 router = APIRouter()
-r = Redis(host="localhost", port=6379, decode_responses=True)
+
+
+def quoted_price(order_in: OrderIn) -> tuple[float, float] | None:
+    """(price, white_price) из котировки заказа, если она действительна."""
+    if not order_in.quote:
+        return None
+    quote = decode_quote(order_in.quote)
+    if (
+        quote is None
+        or quote["item"] != order_in.item_type
+        or quote["amount"] != order_in.amount
+    ):
+        return None
+    return quote["usd"], quote["white"]
 
 
 @router.post(
@@ -47,7 +62,7 @@ r = Redis(host="localhost", port=6379, decode_responses=True)
         422: {"description": "Нарушены ограничения по количеству/полям."},
     },
 )
-def create_order(
+async def create_order(
     request: Request,
     order_in: OrderIn,
     principal: Principal = Depends(current_principal),
@@ -60,27 +75,34 @@ def create_order(
       Для гостей возвращается ошибка `payment_creation_failed`.
     * **gift** — требуется `payload.gift_id` из `settings.available_gifts` и валидный получатель.
 
+    Если передана действительная котировка `quote` из `/info/price` для того же
+    типа и количества, цена берётся из неё без повторного расчёта.
+
     Результат:
     * Для методов TonConnect возвращается `ton_transaction` (а `pay_url` = `null`).
     * Для остальных методов возвращается `pay_url` (а `ton_transaction` = `null`).
     """
     if principal["kind"] == "guest":
-        gs, _ = GuestSession.objects.get_or_create(id=principal["payload"]["sid"])
+        gs = await touch_guest_session(principal["payload"])
         user = None
     else:
         gs = None
         user = principal["user"]
     wallet = get_wallet()
     fragment = FragmentAPI(wallet)
-    ton_methods = PaymentMethod.objects.filter(
-        system__name=PaymentSystem.Names.TON_CONNECT
-    )
     try:
-        chosen_payment_method = PaymentMethod.objects.get(id=order_in.payment_method)
+        chosen_payment_method = await PaymentMethod.objects.select_related(
+            "system"
+        ).aget(id=order_in.payment_method)
     except PaymentMethod.DoesNotExist:
         return OrderResponse(success=False, error="invalid_payment_method", result=None)
+    is_ton_connect = (
+        chosen_payment_method.system.name == PaymentSystem.Names.TON_CONNECT
+    )
+    table = await aget_price_table()
     order_price = 0.0
     white_price = 0.0
+    quoted = quoted_price(order_in)
     order_payload = {}
     order_type = None
     recipient = None
@@ -89,38 +111,46 @@ def create_order(
             if not (50 <= order_in.amount <= 10000):
                 return OrderResponse(success=False, error="invalid_amount", result=None)
             try:
-                recipient = fragment.get_stars_recipient(order_in.recipient).recipient
+                recipient = (
+                    await resolve_recipient(fragment, order_in.recipient, "star")
+                ).recipient
             except ValueError:
                 return OrderResponse(
                     success=False, error="invalid_recipient", result=None
                 )
-            order_price, white_price = get_stars_price(order_in.amount)
+            order_price, white_price = quoted or get_stars_price(order_in.amount, table)
             order_payload = {}
             order_type = Order.Type.STARS
         case "premium":
             if order_in.amount not in {3, 6, 12}:
                 return OrderResponse(success=False, error="invalid_amount", result=None)
             try:
-                recipient = fragment.get_premium_recipient(order_in.recipient).recipient
+                recipient = (
+                    await resolve_recipient(fragment, order_in.recipient, "premium")
+                ).recipient
             except ValueError:
                 return OrderResponse(
                     success=False, error="invalid_recipient", result=None
                 )
-            order_price, white_price = get_premium_price(order_in.amount)  # type: ignore
+            order_price, white_price = quoted or get_premium_price(
+                order_in.amount, table  # type: ignore
+            )
             order_payload = {}
             order_type = Order.Type.PREMIUM
         case "ton":
-            if not ton_methods.filter(id=chosen_payment_method.id).exists():
+            if not is_ton_connect:
                 return OrderResponse(
                     success=False, error="invalid_payment_method", result=None
                 )
             try:
-                recipient = fragment.get_ton_recipient(order_in.recipient).recipient
+                recipient = (
+                    await resolve_recipient(fragment, order_in.recipient, "ton")
+                ).recipient
             except ValueError:
                 return OrderResponse(
                     success=False, error="invalid_recipient", result=None
                 )
-            order_price, white_price = get_ton_price(order_in.amount)  # type: ignore
+            order_price, white_price = quoted or get_ton_price(order_in.amount, table)
             order_payload = {}
             order_type = Order.Type.TON
         case "gift":
@@ -129,20 +159,18 @@ def create_order(
                 return OrderResponse(success=False, error="gift_not_found", result=None)
             if gift_id not in settings.available_gifts:
                 return OrderResponse(success=False, error="gift_not_found", result=None)
-            gifts = bot.get_available_gifts().gifts
-            gifts = list(filter(lambda x: x.id == gift_id, gifts))
-            if len(gifts) == 0:
+            gift = table.gift(gift_id)
+            if gift is None:
                 return OrderResponse(success=False, error="gift_not_found", result=None)
-            gift = gifts[0]
-            if not get_gift_sender().validate_recipient(order_in.recipient):
+            # Уже проверен в /info/validate_user — повторно не спрашиваем
+            validated = await cached_recipient(order_in.recipient, "gift")
+            if validated is None and not await run_in_threadpool(
+                get_gift_sender().validate_recipient, order_in.recipient
+            ):
                 return OrderResponse(
                     success=False, error="invalid_recipient", result=None
                 )
-            white_price = get_stars_price(500)[1] / 500
-            white_price = gift.star_count * white_price
-            order_price = round(
-                white_price + white_price / 100 * settings.gifts_markup, 2
-            )
+            order_price, white_price = gift.usd, gift.white_usd
             order_in.amount = 1
             order_payload = order_in.payload
             order_type = Order.Type.GIFT_REGULAR
@@ -150,7 +178,7 @@ def create_order(
             assert_never(order_in.item_type)
     if not order_type:
         return OrderResponse(success=False, error="internal_error", result=None)
-    order = Order.objects.create(
+    order = await Order.objects.acreate(
         user=user,
         guest_session=gs,
         type=order_type,
@@ -163,14 +191,14 @@ def create_order(
         payload=order_payload,
     )
     payment_id = str(uuid4())
-    payment = Payment.objects.create(
+    payment = await Payment.objects.acreate(
         id=payment_id,
         method=chosen_payment_method,
         sum=order.price,
         status=Payment.Status.CREATED,
         order=order,
     )
-    if ton_methods.filter(id=chosen_payment_method.id).exists():
+    if is_ton_connect:
         if not principal["kind"] == "user":
             return OrderResponse(
                 success=False, error="payment_creation_failed", result=None
@@ -180,14 +208,16 @@ def create_order(
             price_to_send = to_nano(order.price, 6)
         else:
             transaction_type = "ton"
-            price_to_send = to_nano(TON.usd_to_ton(order.price))
-        TonTransaction.objects.create(
+            price_to_send = to_nano(table.usd_to_ton(order.price))
+        await TonTransaction.objects.acreate(
             amount=price_to_send,
             currency=transaction_type.upper(),
             user=principal["user"],
             payment=payment,
         )
-        ton_transaction = build_tonconnect_message(
+        # Внутри asyncio.run() для jetton-кошелька — только в отдельном потоке
+        ton_transaction = await run_in_threadpool(
+            build_tonconnect_message,
             payment_id,
             user_wallet_address=Address(principal["user"].wallet_address),
             recipient_address=Address(settings.deposit_ton_address),
@@ -204,7 +234,10 @@ def create_order(
         pay_url = None
     else:
         ton_transaction = None
-        pay_url = generate_pay_link(order, request.client.host)
+        # Sync ORM + HTTP мерчанта: в поток запроса (thread-sensitive)
+        pay_url = await sync_to_async(generate_pay_link)(
+            order, request.client.host, payment
+        )
         if not pay_url:
             logger.error(f"Error creating payment link for order #{order.id}")
             return OrderResponse(
@@ -1,10 +1,21 @@
+from datetime import datetime
 from typing import Annotated, Optional
 
-from django.db.models import Q, Sum, Count
-from fastapi import APIRouter, Depends
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.db.models import Q, Sum
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.params import Query
 
-from django_stars.stars_app.models import Order, Payment, User, Referral
+from django_stars.stars_app.models import (
+    Order,
+    Payment,
+    User,
+    Referral,
+    ReferralStats,
+)
+from django_stars.stars_app.referrals import ensure_stats
+from django_stars.stars_app.search import recipient_filter
 from fastapi_stars.api.deps import Principal, user_principal
 from fastapi_stars.schemas.info import PriceWithCurrency, PricesWithCurrency
 from fastapi_stars.schemas.users import (
@@ -21,12 +32,19 @@ from fastapi_stars.schemas.users import (
     ReferralItem,
     ReferralsCountResponse,
 )
-from integrations.Currencies import USDT
+from fastapi_stars.utils.pagination import (
+    cached_count,
+    decode_cursor,
+    encode_cursor,
+    fetch_page,
+)
+from fastapi_stars.utils.ref_codes import update_alias
+from integrations.Currencies import aget_rates
 
 router = APIRouter()
 
 
-def get_my_orders_stats(user: User, order_type: Order.Type) -> tuple[int, float]:
+async def get_my_orders_stats(user: User, order_type: Order.Type) -> tuple[int, float]:
     """Внутренняя утилита для агрегации статистики заказов пользователя по типу."""
     orders = Order.objects.filter(
         is_refund=False,
@@ -34,9 +52,10 @@ def get_my_orders_stats(user: User, order_type: Order.Type) -> tuple[int, float]
         type=order_type,
         status__in=(Order.Status.COMPLETED, Order.Status.BLOCKCHAIN_WAITING),
     )
-    orders_amount = orders.aggregate(Sum("amount"))["amount__sum"]
-    orders_price = orders.aggregate(Sum("price"))["price__sum"]
-    return orders_amount or 0, orders_price or 0
+    stats = await orders.aaggregate(
+        amount=Sum("amount", default=0), price=Sum("price", default=0)
+    )
+    return stats["amount"], stats["price"]
 
 
 @router.get(
@@ -53,49 +72,43 @@ def get_my_orders_stats(user: User, order_type: Order.Type) -> tuple[int, float]
         401: {"description": "Недействительная сессия/тип токена."},
     },
 )
-def me(principal: Principal = Depends(user_principal)):
-    stars_stats = get_my_orders_stats(principal["user"], Order.Type.STARS)
-    premium_stats = get_my_orders_stats(principal["user"], Order.Type.PREMIUM)
-    ton_stats = get_my_orders_stats(principal["user"], Order.Type.TON)
-    total_deposit = (
-        Payment.objects.filter(
-            order__user=principal["user"], status=Payment.Status.CONFIRMED
-        ).aggregate(Sum("sum"))["sum__sum"]
-        or 0
+async def me(principal: Principal = Depends(user_principal)):
+    stars_stats = await get_my_orders_stats(principal["user"], Order.Type.STARS)
+    premium_stats = await get_my_orders_stats(principal["user"], Order.Type.PREMIUM)
+    ton_stats = await get_my_orders_stats(principal["user"], Order.Type.TON)
+    deposit = await Payment.objects.filter(
+        order__user=principal["user"], status=Payment.Status.CONFIRMED
+    ).aaggregate(total=Sum("sum", default=0))
+    total_deposit = deposit["total"]
+    rates = await aget_rates()
+    stars_rub, premium_rub, ton_rub, deposit_rub = rates.usd_to_rub_many(
+        (stars_stats[1], premium_stats[1], ton_stats[1], total_deposit)
     )
     user_stats = UserStatistic(
         stars=StatsForOrderType(
             amount=stars_stats[0],
             price=PricesWithCurrency(
                 price_usd=PriceWithCurrency(price=stars_stats[1], currency="usd"),
-                price_rub=PriceWithCurrency(
-                    price=USDT.usd_to_rub(stars_stats[1]), currency="rub"
-                ),
+                price_rub=PriceWithCurrency(price=stars_rub, currency="rub"),
             ),
         ),
         premium=StatsForOrderType(
             amount=premium_stats[0],
             price=PricesWithCurrency(
                 price_usd=PriceWithCurrency(price=premium_stats[1], currency="usd"),
-                price_rub=PriceWithCurrency(
-                    price=USDT.usd_to_rub(premium_stats[1]), currency="rub"
-                ),
+                price_rub=PriceWithCurrency(price=premium_rub, currency="rub"),
             ),
         ),
         ton=StatsForOrderType(
             amount=ton_stats[0],
             price=PricesWithCurrency(
                 price_usd=PriceWithCurrency(price=ton_stats[1], currency="usd"),
-                price_rub=PriceWithCurrency(
-                    price=USDT.usd_to_rub(ton_stats[1]), currency="rub"
-                ),
+                price_rub=PriceWithCurrency(price=ton_rub, currency="rub"),
             ),
         ),
         deposit=PricesWithCurrency(
             price_usd=PriceWithCurrency(price=total_deposit, currency="usd"),
-            price_rub=PriceWithCurrency(
-                price=USDT.usd_to_rub(total_deposit), currency="rub"
-            ),
+            price_rub=PriceWithCurrency(price=deposit_rub, currency="rub"),
         ),
     )
     user = principal["user"]
@@ -119,14 +132,23 @@ def me(principal: Principal = Depends(user_principal)):
         200: {"description": "Алиас успешно сохранён"},
         400: {"description": "Невалидный алиас (длина, формат и т.п.)"},
         401: {"description": "Недействительная сессия/тип токена."},
+        409: {"description": "Алиас уже занят другим пользователем"},
     },
 )
-def set_ref_alias(
+async def set_ref_alias(
     ref_alias: RefAliasIn, principal: Principal = Depends(user_principal)
 ):
     user = principal["user"]
+    old_alias = user.ref_alias
     user.ref_alias = ref_alias.ref_alias
-    user.save(update_fields=("ref_alias",))
+    try:
+        await user.asave(update_fields=("ref_alias",))
+    except IntegrityError:
+        user.ref_alias = old_alias
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Alias is already taken"
+        )
+    await update_alias(old_alias, user.ref_alias, user.wallet_address)
     return SuccessResponse(success=True)
 
 
@@ -145,12 +167,15 @@ def set_ref_alias(
     },
 )
 @router.get("/orders", response_model=OrdersResponse, summary="Мои заказы ...")
-def get_my_orders(
+async def get_my_orders(
     search_query: Annotated[
         Optional[str],
         Query(
             title="Поиск",
-            description="Подстрочный поиск по recipient_username.",
+            description=(
+                "Поиск по recipient_username без учёта регистра: до 3 символов — "
+                "по началу, длиннее — по подстроке."
+            ),
             example="john",
         ),
     ] = None,
@@ -181,27 +206,48 @@ def get_my_orders(
             example=10,
         ),
     ] = 10,
+    cursor: Annotated[
+        Optional[str],
+        Query(
+            title="Курсор",
+            description="`next_cursor` из предыдущего ответа; `offset` тогда не нужен.",
+        ),
+    ] = None,
+    with_total: Annotated[
+        bool,
+        Query(
+            title="Считать total",
+            description="Вернуть общее количество (кэшируется на минуту).",
+        ),
+    ] = True,
     principal: Principal = Depends(user_principal),
 ):
     user = principal["user"]
     search_query = search_query or ""
-    order_type = Q(type=order_type) if order_type else Q()
-    my_orders = (
-        Order.objects.filter(
-            ~Q(status__in=(Order.Status.CANCEL, Order.Status.CREATING)), user=user
+    my_orders = Order.objects.filter(
+        ~Q(status__in=(Order.Status.CANCEL, Order.Status.CREATING)), user=user
+    ).order_by("-id")
+    if search := recipient_filter(user.id, search_query):
+        my_orders = my_orders.filter(search)
+    if order_type:
+        my_orders = my_orders.filter(type=order_type)
+    page = my_orders
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        page, offset = my_orders.filter(id__lt=last_id), 0
+    orders, has_more = await fetch_page(page, on_page, offset)
+
+    total = None
+    if with_total:
+        total = await cached_count(
+            my_orders, "orders", user.id, search_query, order_type
         )
-        .filter(recipient_username__icontains=search_query)
-        .filter(order_type)
-        .order_by("-id")
-    )
-    total_orders = my_orders.count()
-    my_orders = my_orders[offset : offset + on_page]
     return OrdersResponse(
         items=[
-            OrderModel.model_validate(order, from_attributes=True)
-            for order in my_orders
+            OrderModel.model_validate(order, from_attributes=True) for order in orders
         ],
-        total=total_orders,
+        total=total,
+        next_cursor=encode_cursor(orders[-1].id) if has_more else None,
     )
 
 
@@ -216,7 +262,7 @@ def get_my_orders(
     },
 )
 @router.get("/payments", response_model=PaymentsResponse, summary="Мои платежи ...")
-def get_my_payments(
+async def get_my_payments(
     on_page: Annotated[
         int,
         Query(
@@ -237,18 +283,49 @@ def get_my_payments(
             example=0,
         ),
     ] = 0,
+    cursor: Annotated[
+        Optional[str],
+        Query(
+            title="Курсор",
+            description="`next_cursor` из предыдущего ответа; `offset` тогда не нужен.",
+        ),
+    ] = None,
+    with_total: Annotated[
+        bool,
+        Query(
+            title="Считать total",
+            description="Вернуть общее количество (кэшируется на минуту).",
+        ),
+    ] = True,
     principal: Principal = Depends(user_principal),
 ):
     user = principal["user"]
-    my_payments = Payment.objects.filter(order__user=user).order_by("-created_at")
-    total_payments = my_payments.count()
-    my_payments = my_payments[offset : offset + on_page]
+    my_payments = Payment.objects.filter(order__user=user).order_by(
+        "-created_at", "-id"
+    )
+    page = my_payments
+    if cursor:
+        created_at, last_id = decode_cursor(cursor, datetime, str)
+        page = my_payments.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id)
+        )
+        offset = 0
+    payments, has_more = await fetch_page(page, on_page, offset)
+
+    total = None
+    if with_total:
+        total = await cached_count(my_payments, "payments", user.id)
+    next_cursor = None
+    if has_more:
+        last = payments[-1]
+        next_cursor = encode_cursor(last.created_at.isoformat(), last.id)
     return PaymentsResponse(
         items=[
             PaymentModel.model_validate(payment, from_attributes=True)
-            for payment in my_payments
+            for payment in payments
         ],
-        total=total_payments,
+        total=total,
+        next_cursor=next_cursor,
     )
 
 
@@ -267,7 +344,7 @@ def get_my_payments(
     },
 )
 @router.get("/referrals", response_model=ReferralsResponse, summary="Мои рефералы ...")
-def get_my_referrals(
+async def get_my_referrals(
     search_query: Annotated[
         Optional[str],
         Query(
@@ -301,6 +378,20 @@ def get_my_referrals(
             example=10,
         ),
     ] = 10,
+    cursor: Annotated[
+        Optional[str],
+        Query(
+            title="Курсор",
+            description="`next_cursor` из предыдущего ответа; `offset` тогда не нужен.",
+        ),
+    ] = None,
+    with_total: Annotated[
+        bool,
+        Query(
+            title="Считать total",
+            description="Вернуть общее количество (кэшируется на минуту).",
+        ),
+    ] = True,
     principal: "Principal" = Depends(user_principal),
 ):
     user = principal["user"]
@@ -322,8 +413,12 @@ def get_my_referrals(
                 | Q(referred__ref_alias__icontains=sq)
             )
 
-    total = qs.count()
-    qs = qs[offset : offset + on_page]
+    page = qs
+    if cursor:
+        last_level, last_id = decode_cursor(cursor, int, int)
+        page = qs.filter(Q(level__gt=last_level) | Q(level=last_level, id__lt=last_id))
+        offset = 0
+    referrals, has_more = await fetch_page(page, on_page, offset)
 
     items = [
         ReferralItem(
@@ -331,10 +426,16 @@ def get_my_referrals(
             level=ref.level,
             profit=float(ref.profit),
         )
-        for ref in qs
+        for ref in referrals
     ]
 
-    return ReferralsResponse(items=items, total=total)
+    total = None
+    if with_total:
+        total = await cached_count(qs, "referrals", user.id, level, search_query)
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(referrals[-1].level, referrals[-1].id)
+    return ReferralsResponse(items=items, total=total, next_cursor=next_cursor)
 
 
 @router.get(
@@ -349,29 +450,17 @@ def get_my_referrals(
         401: {"description": "Недействительная сессия/тип токена."},
     },
 )
-def get_my_referrals_count(principal: "Principal" = Depends(user_principal)):
+async def get_my_referrals_count(principal: "Principal" = Depends(user_principal)):
     user = principal["user"]
-    referrals = (
-        Referral.objects.filter(referrer=user)
-        .values("level")
-        .annotate(count=Count("id"))
-    )
-
-    referrals_profit = Referral.objects.filter(referrer=user).aggregate(
-        profit=Sum("profit")
-    )
-    referrals_profit_sum = referrals_profit["profit"] or 0.0
-
-    level_counts = {1: 0, 2: 0, 3: 0}
-    for entry in referrals:
-        level_counts[entry["level"]] = entry["count"]
-
-    total_count = sum(level_counts.values())
-
+    stats = await ReferralStats.objects.filter(user=user).afirst()
+    if stats is None:
+        # Рефералы появились до ReferralStats и ещё не перенесены в сводку
+        await sync_to_async(ensure_stats)([user.id])
+        stats = await ReferralStats.objects.aget(user=user)
     return ReferralsCountResponse(
-        level_1=level_counts[1],
-        level_2=level_counts[2],
-        level_3=level_counts[3],
-        total=total_count,
-        total_reward=referrals_profit_sum,
+        level_1=stats.level_1,
+        level_2=stats.level_2,
+        level_3=stats.level_3,
+        total=stats.level_1 + stats.level_2 + stats.level_3,
+        total_reward=stats.total_profit,
     )
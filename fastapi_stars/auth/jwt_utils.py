@@ -1,56 +1,23 @@
-import time
-
 import jwt
 from fastapi import HTTPException, status
 
+from fastapi_stars.auth.token_service import TokenService
+from fastapi_stars.settings import settings
 
-def now_ts() -> int:
-    return int(time.time())
-
-
-def create_guest_token(
-    secret: str,
-    alg: str,
-    ttl_sec: int,
-    sid: str,
-    ton_verify: str,
-    ref: str | None = None,
-) -> str:
-    iat = now_ts()
-    return jwt.encode(
-        {
-            "sid": sid,
-            "iat": iat,
-            "exp": iat + ttl_sec,
-            "type": "guest",
-            "ton_verify": ton_verify,
-            "ref": ref,
-        },
-        secret,
-        algorithm=alg,
-    )
+token_service = TokenService.from_settings(settings)
 
 
-def create_user_token(
-    user_id: str, secret: str, alg: str, ttl: int, token_type: str, ep: int
-) -> str:
-    iat = now_ts()
-    return jwt.encode(
-        {
-            "sub": user_id,
-            "iat": iat,
-            "exp": iat + ttl,
-            "type": token_type,
-            "ep": ep,
-        },
-        secret,
-        algorithm=alg,
-    )
+def decode_quote(token: str) -> dict | None:
+    """Payload котировки или None, если токен невалиден/истёк."""
+    try:
+        return token_service.decode(token, expected_type="quote")
+    except jwt.PyJWTError:
+        return None
 
 
-def decode_any(token: str, secret: str, alg: str) -> dict:
+def decode_any(token: str) -> dict:
     try:
-        return jwt.decode(token, secret, algorithms=[alg])
+        return token_service.decode(token)
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired"
@@ -0,0 +1,200 @@
+"""
+Выпуск и проверка JWT.
+
+Ключи разбираются один раз при создании сервиса, экземпляр `PyJWS` и объект
+алгоритма переиспользуются. Для EdDSA/ES256 проверять токены можно по одному
+публичному ключу (например, на edge), не зная секрета.
+
+Недавно проверенные токены хранятся в LRU по подписи: повторный запрос с тем же
+токеном не пересчитывает подпись, а только сравнивает signing input и заново
+проверяет сроки (`exp`/`iat`).
+"""
+
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+import jwt
+from jwt.api_jws import PyJWS
+
+ASYMMETRIC = {"EdDSA", "ES256"}
+
+
+def now_ts() -> int:
+    return int(time.time())
+
+
+class TokenService:
+    def __init__(
+        self,
+        alg: str,
+        signing_key: Any = None,
+        verifying_key: Any = None,
+        ttl: dict[str, int] | None = None,
+        cache_size: int = 10_000,
+        leeway: int = 0,
+    ):
+        """
+        :param alg: Алгоритм подписи (HS256, EdDSA, ES256, ...)
+        :param signing_key: Секрет HMAC или приватный ключ (PEM/объект ключа)
+        :param verifying_key: Публичный ключ; для HMAC и при наличии приватного
+            ключа можно не указывать
+        :param ttl: Время жизни по типу токена: access, refresh, guest, quote
+        :param cache_size: Размер LRU проверенных токенов, 0 — без кэша
+        :param leeway: Допуск по времени для `exp`/`iat`, секунд
+        """
+        self.alg = alg
+        self.ttl = ttl or {}
+        self.cache_size = cache_size
+        self.leeway = leeway
+        self._jws = PyJWS(algorithms=[alg])
+        algorithm = self._jws.get_algorithm_by_name(alg)
+        self._signing_key = (
+            algorithm.prepare_key(signing_key) if signing_key is not None else None
+        )
+        if verifying_key is not None:
+            self._verifying_key = algorithm.prepare_key(verifying_key)
+        elif alg in ASYMMETRIC and self._signing_key is not None:
+            self._verifying_key = self._signing_key.public_key()
+        else:
+            self._verifying_key = self._signing_key
+        if self._verifying_key is None:
+            raise ValueError(f"No key to verify {alg} tokens")
+        # signature -> (signing input, claims)
+        self._verified: OrderedDict[str, tuple[str, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings) -> "TokenService":
+        if settings.jwt_alg in ASYMMETRIC:
+            private_key = settings.jwt_private_key
+            signing_key = private_key.get_secret_value() if private_key else None
+            verifying_key = settings.jwt_public_key or None
+        else:
+            signing_key = settings.jwt_secret.get_secret_value()
+            verifying_key = None
+        return cls(
+            settings.jwt_alg,
+            signing_key,
+            verifying_key,
+            ttl={
+                "access": settings.jwt_access_ttl,
+                "refresh": settings.jwt_refresh_ttl,
+                "guest": settings.jwt_guest_ttl,
+                "quote": settings.quote_ttl,
+            },
+            cache_size=settings.jwt_verified_cache_size,
+        )
+
+    # --- выпуск ---
+
+    def encode(self, claims: dict) -> str:
+        if self._signing_key is None:
+            raise RuntimeError(f"No private key to sign {self.alg} tokens")
+        payload = json.dumps(claims, separators=(",", ":")).encode()
+        return self._jws.encode(payload, self._signing_key, algorithm=self.alg)
+
+    def issue_pair(self, user_id: str, ep: int) -> tuple[str, str]:
+        """(access, refresh) пользователя с общим `iat`."""
+        iat = now_ts()
+        claims = {"sub": user_id, "iat": iat, "ep": ep}
+        access = self.encode(
+            {**claims, "exp": iat + self.ttl["access"], "type": "access"}
+        )
+        refresh = self.encode(
+            {**claims, "exp": iat + self.ttl["refresh"], "type": "refresh"}
+        )
+        return access, refresh
+
+    def issue_guest(self, sid: str, ton_verify: str, ref: str | None = None) -> str:
+        iat = now_ts()
+        return self.encode(
+            {
+                "sid": sid,
+                "iat": iat,
+                "exp": iat + self.ttl["guest"],
+                "type": "guest",
+                "ton_verify": ton_verify,
+                "ref": ref,
+            }
+        )
+
+    def issue_quote(self, item: str, amount: int, usd: float, white: float) -> str:
+        iat = now_ts()
+        return self.encode(
+            {
+                "iat": iat,
+                "exp": iat + self.ttl["quote"],
+                "type": "quote",
+                "item": item,
+                "amount": amount,
+                "usd": usd,
+                "white": white,
+            }
+        )
+
+    # --- проверка ---
+
+    def decode(self, token: str, expected_type: str | None = None) -> dict:
+        """
+        Claims действительного токена.
+
+        :raises jwt.ExpiredSignatureError: срок действия истёк
+        :raises jwt.PyJWTError: подпись/формат/тип токена неверны
+        """
+        signing_input, _, signature = token.rpartition(".")
+        cached = self._cached(signature) if self.cache_size else None
+        if cached is not None and hmac.compare_digest(cached[0], signing_input):
+            claims = cached[1]
+        else:
+            claims = self._verify(token)
+            if self.cache_size:
+                self._remember(signature, signing_input, claims)
+        self._validate(claims, expected_type)
+        return dict(claims)
+
+    def _verify(self, token: str) -> dict:
+        decoded = self._jws.decode_complete(
+            token, key=self._verifying_key, algorithms=[self.alg]
+        )
+        try:
+            claims = json.loads(decoded["payload"])
+        except ValueError as e:
+            raise jwt.DecodeError(f"Invalid payload string: {e}")
+        if not isinstance(claims, dict):
+            raise jwt.DecodeError("Invalid payload string: must be a json object")
+        return claims
+
+    def _validate(self, claims: dict, expected_type: str | None) -> None:
+        now = now_ts()
+        exp = claims.get("exp")
+        if not isinstance(exp, int):
+            raise jwt.MissingRequiredClaimError("exp")
+        if exp <= now - self.leeway:
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        iat = claims.get("iat")
+        if iat is not None:
+            if not isinstance(iat, int):
+                raise jwt.InvalidIssuedAtError(
+                    "Issued At claim (iat) must be an integer"
+                )
+            if iat > now + self.leeway:
+                raise jwt.ImmatureSignatureError("The token is not yet valid (iat)")
+        if expected_type is not None and claims.get("type") != expected_type:
+            raise jwt.InvalidTokenError("Unexpected token type")
+
+    def _cached(self, signature: str) -> tuple[str, dict] | None:
+        with self._lock:
+            cached = self._verified.get(signature)
+            if cached is not None:
+                self._verified.move_to_end(signature)
+            return cached
+
+    def _remember(self, signature: str, signing_input: str, claims: dict) -> None:
+        with self._lock:
+            self._verified[signature] = (signing_input, claims)
+            if len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
@@ -1,13 +1,31 @@
 if True:  # Не сортировать этот импорт
     from fastapi_stars.scripts import init_django  # noqa: F401
 
-from fastapi import FastAPI
+import hmac
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 
 from fastapi_stars.api.routing import api_router
+from fastapi_stars.middleware import MetricsMiddleware, RequestContextMiddleware
 from fastapi_stars.settings import settings
+from fastapi_stars.utils.quotes import PriceTableUnavailable
+from integrations.Currencies import RateUnavailable
+from integrations.utils.metrics import render_metrics
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Пул потоков для sync-кода (Fragment, бот, мерчанты) и sync-зависимостей
+    to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
+    yield
+
 
 app = FastAPI(
+    lifespan=lifespan,
     title="HelperStars Site API",
     version="1.0.0",
     servers=[
@@ -24,6 +42,29 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestContextMiddleware)
+# Снаружи RequestContextMiddleware: в замер входит и закрытие соединений с БД
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(PriceTableUnavailable)
+async def price_table_unavailable(_, exc: PriceTableUnavailable):
+    # До первой сборки таблицы воркером или пока он не может её обновить
+    return JSONResponse(
+        {"detail": "Prices are temporarily unavailable"},
+        status_code=503,
+        headers={"Retry-After": "5"},
+    )
+
+
+@app.exception_handler(RateUnavailable)
+async def rate_unavailable(_, exc: RateUnavailable):
+    # Фидер курсов не обновлял курс дольше MAX_STALENESS
+    return JSONResponse(
+        {"detail": "Exchange rates are temporarily unavailable"},
+        status_code=503,
+        headers={"Retry-After": "60"},
+    )
 
 
 @app.get("/tonconnect-manifest.json", include_in_schema=False)
@@ -35,4 +76,18 @@ def tonconnect_manifest():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics(authorization: str | None = Header(default=None)):
+    token = settings.metrics_token
+    # Без токена эндпоинт не отдаётся вовсе, чтобы не открыть метрики наружу
+    if not token or not token.get_secret_value():
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Байты, а не str: compare_digest не принимает не-ASCII строки
+    expected = f"Bearer {token.get_secret_value()}".encode()
+    if not hmac.compare_digest((authorization or "").encode(), expected):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+
 app.include_router(api_router, prefix="/api")
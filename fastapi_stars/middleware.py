@@ -0,0 +1,94 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from loguru import logger
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from fastapi_stars.settings import settings
+from fastapi_stars.utils.orm_threads import OrmThreadPool
+from integrations.Currencies.snapshot import rates_scope
+from integrations.utils.metrics import (
+    REQUEST_LATENCY,
+    REQUEST_UPSTREAM,
+    request_breakdown,
+)
+
+# Остальные методы пишутся в метрики как `other`
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+
+class RequestContextMiddleware:
+    """
+    Открывает контекст запроса: снимок курсов валют и поток для Django ORM.
+
+    Чистый ASGI (не BaseHTTPMiddleware), чтобы ContextVar'ы, выставленные
+    здесь, были видны эндпоинтам, в том числе sync в threadpool.
+
+    Запрос получает поток async ORM из пула долгоживущих потоков (см.
+    `OrmThreadPool`); без этого все запросы процесса выполняли бы SQL по
+    очереди в одном общем потоке. Соединения потоков переиспользуются между
+    запросами (`CONN_MAX_AGE`). После запроса закрываются только устаревшие и
+    сломанные соединения, как в обработчике запросов Django.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.orm_threads = OrmThreadPool(settings.orm_threads)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        async with self.orm_threads.context():
+            try:
+                with rates_scope():
+                    await self.app(scope, receive, send)
+            finally:
+                await sync_to_async(close_old_connections)()
+
+
+class MetricsMiddleware:
+    """
+    Длительность запроса и её разбивка по внешним сервисам (см. `timed()`).
+
+    Маршрут берётся шаблоном пути (`/api/orders/{order_id}`), а нестандартные
+    методы сводятся к `other`, чтобы число рядов в Prometheus не росло с
+    числом id и произвольными запросами. Медленные запросы пишутся в лог
+    вместе с разбивкой.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        with request_breakdown() as breakdown:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                elapsed = time.perf_counter() - start
+                route = getattr(scope.get("route"), "path", "unmatched")
+                method = scope["method"]
+                if method not in HTTP_METHODS:
+                    method = "other"
+                REQUEST_LATENCY.labels(method, route, status).observe(elapsed)
+                for service, spent in breakdown.items():
+                    REQUEST_UPSTREAM.labels(route, service).observe(spent)
+                if elapsed >= settings.slow_request_seconds:
+                    parts = ", ".join(f"{k}={v:.3f}" for k, v in breakdown.items())
+                    logger.warning(
+                        f"Slow request {scope['method']} {route} {status}: "
+                        f"{elapsed:.3f}s ({parts or 'no upstream calls'})"
+                    )
@@ -39,6 +39,19 @@ class PricesWithCurrency(BaseModel):
     }
 
 
+class QuotedPrice(PricesWithCurrency):
+    """Цена заказа с подписанной котировкой для `/orders/create`."""
+
+    quote: str = Field(
+        ...,
+        description=(
+            "Подписанная котировка (JWT) с ценой в USD. Передайте её в поле "
+            "`quote` при создании заказа с тем же типом и количеством, чтобы "
+            "заказ был создан по этой цене. Действует `settings.quote_ttl` секунд."
+        ),
+    )
+
+
 class HeaderPrices(BaseModel):
     """Набор ориентировочных цен для отображения в заголовке сайта/приложения."""
 
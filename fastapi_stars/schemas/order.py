@@ -203,6 +203,13 @@ class OrderIn(BaseModel):
         description="Идентификатор получателя (Telegram username без `@` или иной ожидаемый формат).",
         examples=["telegram"],
     )
+    quote: str | None = Field(
+        None,
+        description=(
+            "Котировка из `/info/price/{type}/{amount}`. Если она действительна и "
+            "совпадает по типу и количеству, заказ создаётся по её цене."
+        ),
+    )
 
     model_config = {
         "populate_by_name": True,
@@ -110,11 +110,19 @@ class OrderModel(BaseModel):
 
 class OrdersResponse(BaseModel):
     items: list[OrderModel] = Field(..., description="Список заказов.")
-    total: int = Field(
-        ...,
-        description="Общее количество найденных заказов (для пагинации).",
+    total: int | None = Field(
+        None,
+        description=(
+            "Общее количество найденных заказов (для пагинации). "
+            "`null`, если запрошено `with_total=false`."
+        ),
         json_schema_extra={"example": 37},
     )
+    next_cursor: str | None = Field(
+        None,
+        description="Курсор следующей страницы; `null` — страница последняя.",
+        json_schema_extra={"example": "WzEwMV0"},
+    )
 
     model_config = {
         "json_schema_extra": {
@@ -132,6 +140,7 @@ class OrdersResponse(BaseModel):
                         }
                     ],
                     "total": 37,
+                    "next_cursor": "WzEwMV0",
                 }
             ]
         }
@@ -167,11 +176,19 @@ class PaymentModel(BaseModel):
 
 class PaymentsResponse(BaseModel):
     items: list[PaymentModel] = Field(..., description="Список платежей.")
-    total: int = Field(
-        ...,
-        description="Общее количество найденных платежей (для пагинации).",
+    total: int | None = Field(
+        None,
+        description=(
+            "Общее количество найденных платежей (для пагинации). "
+            "`null`, если запрошено `with_total=false`."
+        ),
         json_schema_extra={"example": 12},
     )
+    next_cursor: str | None = Field(
+        None,
+        description="Курсор следующей страницы; `null` — страница последняя.",
+        json_schema_extra={"example": "WzEwMV0"},
+    )
 
     model_config = {
         "json_schema_extra": {
@@ -187,6 +204,7 @@ class PaymentsResponse(BaseModel):
                         }
                     ],
                     "total": 12,
+                    "next_cursor": None,
                 }
             ]
         }
@@ -215,11 +233,19 @@ class ReferralItem(BaseModel):
 
 class ReferralsResponse(BaseModel):
     items: list[ReferralItem] = Field(..., description="Список рефералов.")
-    total: int = Field(
-        ...,
-        description="Общее количество рефералов (для пагинации).",
+    total: int | None = Field(
+        None,
+        description=(
+            "Общее количество рефералов (для пагинации). "
+            "`null`, если запрошено `with_total=false`."
+        ),
         json_schema_extra={"example": 25},
     )
+    next_cursor: str | None = Field(
+        None,
+        description="Курсор следующей страницы; `null` — страница последняя.",
+        json_schema_extra={"example": "WzEsNDJd"},
+    )
 
     model_config = {
         "json_schema_extra": {
@@ -230,6 +256,7 @@ class ReferralsResponse(BaseModel):
                         {"wallet_address": "EQC2...efgh", "level": 2, "profit": 1.5},
                     ],
                     "total": 25,
+                    "next_cursor": "WzIsNDJd",
                 }
             ]
         }
@@ -0,0 +1,79 @@
+"""
+Замер накладных расходов авторизации на запрос.
+
+    python -m fastapi_stars.scripts.bench_auth
+    python -m fastapi_stars.scripts.bench_auth --alg EdDSA -n 20000
+
+Сравнивает `jwt.decode` на каждый запрос (как было) с `TokenService` без кэша
+и с кэшем проверенных токенов. Ключи генерируются на лету, настройки и Django
+не нужны.
+"""
+
+import argparse
+import timeit
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+from fastapi_stars.auth.token_service import TokenService
+
+TTL = {"access": 3600, "refresh": 3600, "guest": 3600, "quote": 3600}
+
+
+def _keys(alg: str):
+    """(ключ подписи, ключ проверки) для `jwt.decode`."""
+    if alg == "EdDSA":
+        private_key = ed25519.Ed25519PrivateKey.generate()
+        return private_key, private_key.public_key()
+    if alg == "ES256":
+        private_key = ec.generate_private_key(ec.SECP256R1())
+        return private_key, private_key.public_key()
+    return "bench-secret", "bench-secret"
+
+
+def _report(name: str, seconds: float, number: int) -> None:
+    print(f"{name:<28} {seconds / number * 1e6:8.1f} µs/запрос")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--alg", default="HS256", choices=["HS256", "EdDSA", "ES256"])
+    parser.add_argument("-n", "--number", type=int, default=50_000)
+    args = parser.parse_args()
+
+    signing_key, verifying_key = _keys(args.alg)
+    cold = TokenService(args.alg, signing_key, ttl=TTL, cache_size=0)
+    warm = TokenService(args.alg, signing_key, ttl=TTL)
+    access, _ = warm.issue_pair("1", 0)
+    expected = jwt.decode(access, verifying_key, algorithms=[args.alg])
+    assert cold.decode(access) == warm.decode(access) == expected
+
+    print(f"{args.alg}, {args.number} запросов")
+    _report(
+        "jwt.decode",
+        timeit.timeit(
+            lambda: jwt.decode(access, verifying_key, algorithms=[args.alg]),
+            number=args.number,
+        ),
+        args.number,
+    )
+    _report(
+        "TokenService (без кэша)",
+        timeit.timeit(lambda: cold.decode(access), number=args.number),
+        args.number,
+    )
+    _report(
+        "TokenService (кэш)",
+        timeit.timeit(lambda: warm.decode(access), number=args.number),
+        args.number,
+    )
+
+    _report(
+        "issue_pair",
+        timeit.timeit(lambda: warm.issue_pair("1", 0), number=args.number // 10),
+        args.number // 10,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Повторное применение вебхуков мерчантов из Redis stream.
+
+    python -m fastapi_stars.scripts.replay_webhooks 1718000000000-0 ...
+    python -m fastapi_stars.scripts.replay_webhooks --since 2024-06-10T12:00
+    python -m fastapi_stars.scripts.replay_webhooks --pending --provider heleket
+    python -m fastapi_stars.scripts.replay_webhooks --dead
+
+С `--dead` записи берутся из dead-letter стрима (исчерпали попытки в воркере)
+и после успешного применения удаляются из него.
+
+Подтверждение платежа идемпотентно, поэтому повтор уже применённых записей
+безопасен: они просто попадут в журнал PaymentWebhook с transitioned=False.
+"""
+
+import argparse
+from datetime import datetime
+
+from fastapi_stars.scripts import init_django  # noqa: F401
+from integrations.Merchants import queue
+from integrations.workers.webhooks import _webhooks, apply_entry
+
+
+def _stream_id(value: str) -> str:
+    if "-" in value and value.split("-", 1)[0].isdigit():
+        return value
+    return str(int(datetime.fromisoformat(value).timestamp() * 1000))
+
+
+def _entries(args):
+    stream = queue.DEAD_STREAM if args.dead else queue.STREAM
+    if args.ids:
+        for entry_id in args.ids:
+            yield from queue.r.xrange(stream, entry_id, entry_id)
+    elif args.pending:
+        for item in queue.r.xpending_range(
+            queue.STREAM, queue.GROUP, min="-", max="+", count=10_000
+        ):
+            entry_id = item["message_id"]
+            yield from queue.r.xrange(queue.STREAM, entry_id, entry_id)
+    else:
+        yield from queue.r.xrange(stream, args.since, args.until)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("ids", nargs="*", help="ID записей стрима")
+    parser.add_argument("--since", type=_stream_id, default="-")
+    parser.add_argument("--until", type=_stream_id, default="+")
+    parser.add_argument("--provider", help="Только эта платёжная система")
+    parser.add_argument(
+        "--pending", action="store_true", help="Только неподтверждённые записи"
+    )
+    parser.add_argument(
+        "--dead", action="store_true", help="Записи из dead-letter стрима"
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    webhooks = _webhooks()
+    replayed = 0
+    for entry_id, fields in _entries(args):
+        provider, _, _ = queue.decode_entry(fields)
+        if args.provider and provider != args.provider:
+            continue
+        print(entry_id.decode(), provider)
+        if not args.dry_run:
+            apply_entry(webhooks, entry_id, fields)
+            if args.dead:
+                queue.r.xdel(queue.DEAD_STREAM, entry_id)
+        replayed += 1
+    print(f"Replayed: {replayed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,19 +5,51 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     app_name: str = "stars_site_backend"
     allowed_origins: list[str] = Field(default=["*"])
+    threadpool_size: int = 40  # потоков anyio на воркер для блокирующих вызовов
+    # Потоков async ORM на воркер; у каждого своё постоянное соединение с БД
+    orm_threads: int = 20
+    # Bearer-токен для /metrics; без него эндпоинт отвечает 404
+    metrics_token: SecretStr | None = None
+    slow_request_seconds: float = 2  # запросы дольше пишутся в лог с разбивкой
+    worker_metrics_port: int = 9101  # /metrics процесса run_threads.py, 0 — выкл.
+    worker_stall_seconds: int = 300  # предупреждение, если воркер не отмечался
     stars_markup: int = 9
     gifts_markup: int = 25
     ton_markup: int = 10
+    # Реферальные начисления, % от маржи заказа (price - white_price) по уровням,
+    # например [10, 5, 2]; пустой список — начисление выключено
+    referral_percents: list[float] = Field(default=[])
+    # Фиксированные курсы вместо бирж (локально/тесты): {"ton_rate": 3.1, ...}
+    rates_stub: dict[str, float] = Field(default={})
     bot_token: SecretStr
     site_url: str = "https://helperstars.tg"
 
     pay_success_url: str
+    # Вебхуки мерчантов: сразу отвечать и применять в фоне (Redis stream)
+    merchant_webhooks_queue: bool = False
+
+    redis_host: str = "localhost"
+    redis_port: int = 6379
+    redis_db: int = 0
+    redis_unix_socket: str | None = None  # если задан, host/port не используются
+    redis_max_connections: int = 50  # на процесс, отдельно для sync и async
+    redis_pool_timeout: float = 5  # ожидание свободного соединения из пула
+    redis_socket_timeout: float = 5  # блокирующие чтения (XREADGROUP, BLMOVE) короче
+    redis_connect_timeout: float = 2
+    redis_key_prefix: str = "stars_site"
 
     jwt_secret: SecretStr
     jwt_alg: str = "HS256"
+    # PEM-ключи для EdDSA/ES256; без приватного ключа токены только проверяются
+    jwt_private_key: SecretStr | None = None
+    jwt_public_key: str | None = None
+    jwt_verified_cache_size: int = 10_000  # LRU проверенных токенов, 0 — выкл.
     jwt_access_ttl: int = 3600  # 1 час
     jwt_refresh_ttl: int = 30 * 24 * 3600  # 30 дней
     jwt_guest_ttl: int = 7 * 24 * 3600  # 7 дней
+    quote_ttl: int = 120  # подписанная котировка из /info/price
+    # Таблица цен старше этого (воркер не может пересобрать) не отдаётся — 503
+    price_table_max_age: int = 600
 
     telegram_api_id: int
     telegram_api_hash: SecretStr
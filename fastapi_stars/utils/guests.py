@@ -0,0 +1,166 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.db import connection, transaction
+from django.db.models import F, Max, Min, Q
+from django.utils import timezone as dj_timezone
+from loguru import logger
+
+from django_stars.stars_app.models import GuestSession, Order, OrderRecipientTrigram
+from fastapi_stars.settings import settings
+from integrations.payments.rewards import accrue_order_rewards
+from integrations.utils.cache import cache_key, redis_client
+
+# Будильник воркера переноса гостевых заказов. Источник истины — БД:
+# закреплённые сессии (`claimed_by_user`), у которых ещё остались заказы
+CLAIMS_QUEUE = cache_key("guest_claims")
+CLAIM_BATCH = 500
+
+
+async def touch_guest_session(payload: dict) -> GuestSession:
+    """
+    Гостевая сессия из guest-JWT, записанная в БД одним upsert.
+
+    Строка появляется только при первом заказе гостя; повторные заказы лишь
+    обновляют `last_seen`. `expires_at` совпадает со сроком действия токена.
+    """
+    session = GuestSession(
+        id=payload["sid"],
+        expires_at=datetime.fromtimestamp(payload["exp"], tz=timezone.utc),
+        last_seen=dj_timezone.now(),
+    )
+    # MySQL/MariaDB не принимает unique_fields: конфликт там определяется по PK
+    unique_fields = (
+        ["id"] if connection.features.supports_update_conflicts_with_target else None
+    )
+    await GuestSession.objects.abulk_create(
+        [session],
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=["last_seen"],
+    )
+    return session
+
+
+def enqueue_claim(sid: str, user_id: int) -> None:
+    """Будит воркер; если не получилось, сессию подберёт периодический обход."""
+    redis_client.rpush(CLAIMS_QUEUE, json.dumps({"sid": sid, "user_id": user_id}))
+
+
+def pending_claims(limit: int, exclude=()) -> list[tuple[str, int]]:
+    """
+    (sid, id пользователя) закреплённых сессий, у которых остались заказы.
+
+    :param exclude: sid, которые пропускаются (воркер исчерпал по ним попытки)
+    """
+    return [
+        (str(sid), user_id)
+        for sid, user_id in GuestSession.objects.filter(
+            claimed_by_user__isnull=False, order__isnull=False
+        )
+        .exclude(id__in=list(exclude))
+        .distinct()
+        .values_list("id", "claimed_by_user_id")[:limit]
+    ]
+
+
+def claim_guest_orders(sid: str, user_id: int, batch_size: int = CLAIM_BATCH) -> int:
+    """
+    Переносит заказы гостевой сессии на пользователя батчами.
+
+    Каждый батч — короткая транзакция по списку PK, без блокировки всех заказов
+    сессии сразу. Повторный запуск безопасен: перенесённые заказы уже не
+    относятся к сессии. Завершённым заказам начисляются реферальные — до
+    переноса у них не было покупателя.
+
+    :return: Сколько заказов перенесено
+    """
+    claimed = 0
+    pending = Order.objects.filter(guest_session_id=sid)
+    while ids := list(pending.values_list("id", flat=True)[:batch_size]):
+        with transaction.atomic():
+            OrderRecipientTrigram.objects.filter(order_id__in=ids).update(
+                user_id=user_id
+            )
+            claimed += pending.filter(id__in=ids).update(
+                user_id=user_id, guest_session=None
+            )
+        completed = Order.objects.filter(
+            id__in=ids, status=Order.Status.COMPLETED, referrals_rewarded=False
+        ).values_list("id", flat=True)
+        for order_id in list(completed):
+            accrue_order_rewards(order_id)
+    if claimed:
+        logger.info(f"Guest session {sid}: {claimed} orders moved to user {user_id}")
+    return claimed
+
+
+def backfill_guest_expiry(batch_size: int = CLAIM_BATCH) -> int:
+    """
+    Проставляет сроки сессиям, созданным до появления `expires_at`.
+
+    Миграция заполняет новые колонки временем деплоя, поэтому у таких строк
+    `expires_at` не позже `created_at` — у новых сессий так не бывает.
+    Активность берётся по заказам сессии, срок — активность + `jwt_guest_ttl`.
+    Повторный запуск — no-op.
+
+    :return: Сколько сессий обновлено
+    """
+    ttl = timedelta(seconds=settings.jwt_guest_ttl)
+    legacy = GuestSession.objects.filter(expires_at__lte=F("created_at")).annotate(
+        first_order=Min("order__created_at"), last_order=Max("order__created_at")
+    )
+    updated = 0
+    while sessions := list(legacy[:batch_size]):
+        for session in sessions:
+            if session.last_order is not None:
+                session.created_at = session.first_order
+                session.last_seen = session.last_order
+            session.expires_at = session.last_seen + ttl
+        updated += GuestSession.objects.bulk_update(
+            sessions, ["created_at", "last_seen", "expires_at"]
+        )
+    return updated
+
+
+def cleanup_guest_sessions(
+    grace_days: int = 14,
+    batch_size: int = CLAIM_BATCH,
+    pause: float = 0.1,
+    dry_run: bool = False,
+) -> tuple[int, int]:
+    """
+    Политика хранения гостевых сессий (guest_sessions_clear.md).
+
+    Истёкшие сессии деактивируются; неактивные без заказов удаляются, если
+    истекли более `grace_days` дней назад или уже закреплены за пользователем.
+    Всё — по PK батчами с паузой `pause`, без долгой блокировки таблицы.
+
+    :return: (деактивировано, удалено)
+    """
+    now = dj_timezone.now()
+    cutoff = now - timedelta(days=grace_days)
+
+    expired = GuestSession.objects.filter(expires_at__lt=now, is_active=True)
+    deactivated = 0
+    while ids := list(expired.values_list("id", flat=True)[:batch_size]):
+        if dry_run:
+            deactivated = expired.count()
+            break
+        deactivated += GuestSession.objects.filter(id__in=ids).update(is_active=False)
+        time.sleep(pause)
+
+    removable = GuestSession.objects.filter(
+        Q(expires_at__lt=cutoff) | Q(claimed_by_user__isnull=False),
+        is_active=False,
+        order__isnull=True,
+    )
+    deleted = 0
+    while ids := list(removable.values_list("id", flat=True)[:batch_size]):
+        if dry_run:
+            deleted = removable.count()
+            break
+        deleted += GuestSession.objects.filter(id__in=ids).delete()[0]
+        time.sleep(pause)
+    return deactivated, deleted
@@ -0,0 +1,59 @@
+"""
+Пул долгоживущих потоков для async ORM Django.
+
+Async ORM выполняет SQL через `sync_to_async(thread_sensitive=True)`: внутри
+`ThreadSensitiveContext` — в отдельном потоке контекста, иначе — в одном общем
+потоке процесса. Отдельный `ThreadSensitiveContext` на запрос означал бы новый
+поток и новое соединение с БД на каждый запрос, то есть терял бы постоянные
+соединения (`CONN_MAX_AGE`).
+
+Здесь запрос на время своей обработки получает поток из пула фиксированного
+размера. Потоки живут всё время жизни процесса, и их соединения переиспользуются.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from asgiref.sync import SyncToAsync, ThreadSensitiveContext
+
+
+class OrmThreadPool:
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._queue: asyncio.Queue[ThreadPoolExecutor] | None = None
+        self._pid: int | None = None
+
+    def _executors(self) -> asyncio.Queue[ThreadPoolExecutor]:
+        # Потоки не переживают fork (gunicorn `--preload`) — пул свой в каждом воркере
+        if self._pid != os.getpid():
+            queue = asyncio.Queue()
+            for i in range(self._size):
+                queue.put_nowait(
+                    ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"orm-{i}")
+                )
+            self._queue, self._pid = queue, os.getpid()
+        return self._queue
+
+    @asynccontextmanager
+    async def context(self):
+        """
+        Поток пула для ORM-вызовов текущего запроса.
+
+        Если все потоки заняты, запрос ждёт освобождения: число соединений
+        процесса с БД не превышает размера пула.
+        """
+        queue = self._executors()
+        executor = await queue.get()
+        try:
+            async with ThreadSensitiveContext() as context:
+                # asgiref берёт поток контекста из этого словаря. Запись убирается
+                # до выхода из контекста, иначе asgiref остановит executor.
+                SyncToAsync.context_to_thread_executor[context] = executor
+                try:
+                    yield
+                finally:
+                    SyncToAsync.context_to_thread_executor.pop(context, None)
+        finally:
+            queue.put_nowait(executor)
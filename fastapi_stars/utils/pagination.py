@@ -0,0 +1,77 @@
+"""
+Курсорная (keyset) пагинация списков пользователя.
+
+Курсор — непрозрачная строка с ключом сортировки последнего элемента страницы.
+Следующая страница выбирается условием «после этого ключа» по индексу, поэтому
+время ответа не зависит от глубины истории, в отличие от OFFSET.
+"""
+
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+from django.db.models import QuerySet
+from fastapi import HTTPException, status
+
+from integrations.utils.cache import cache_key, get_async_redis
+
+COUNT_TTL = 60
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _convert(value, kind: type):
+    if kind is datetime:
+        if not isinstance(value, str):
+            raise TypeError(value)
+        return datetime.fromisoformat(value)
+    # bool — подкласс int, в курсоре его быть не может
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise TypeError(value)
+    return value
+
+
+def decode_cursor(cursor: str, *kinds: type) -> list:
+    """
+    Значения ключа из курсора; 400, если курсор испорчен.
+
+    :param kinds: Типы значений по порядку: `int`, `str` или `datetime`
+        (в курсоре — ISO-строка)
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, list) or len(values) != len(kinds):
+            raise ValueError(values)
+        return [_convert(value, kind) for value, kind in zip(values, kinds)]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+async def fetch_page(qs: QuerySet, on_page: int, offset: int = 0) -> tuple[list, bool]:
+    """(элементы страницы, есть ли следующая) — одним запросом на on_page + 1."""
+    items = [item async for item in qs[offset : offset + on_page + 1]]
+    return items[:on_page], len(items) > on_page
+
+
+async def cached_count(qs: QuerySet, *parts: object) -> int:
+    """
+    `COUNT(*)` с кэшем в Redis на `COUNT_TTL` секунд.
+
+    :param parts: Всё, от чего зависит выборка `qs` (пользователь, фильтры)
+    """
+    digest = hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+    key = cache_key("count", digest[:16])
+    redis = get_async_redis()
+    cached = await redis.get(key)
+    if cached is not None:
+        return int(cached)
+    total = await qs.acount()
+    await redis.set(key, total, ex=COUNT_TTL)
+    return total
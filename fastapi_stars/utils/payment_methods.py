@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+
+from django_stars.stars_app.models import PaymentMethod, PaymentSystem
+from fastapi_stars.schemas.auth import AuthType
+from fastapi_stars.schemas.info import Item, PaymentMethodModel
+from integrations.utils.invalidation import ReloadableCache
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogueEntry:
+    id: int
+    system: str
+    min_amount: float
+    model: PaymentMethodModel
+
+    @property
+    def is_ton_connect(self) -> bool:
+        return self.system == PaymentSystem.Names.TON_CONNECT
+
+
+def _load_entries() -> tuple[CatalogueEntry, ...]:
+    """Активные методы оплаты, уже отсортированные по `-order, name`."""
+    methods = (
+        PaymentMethod.objects.filter(system__is_active=True)
+        .select_related("system")
+        .order_by("-order", "name")
+    )
+    return tuple(
+        CatalogueEntry(
+            id=m.id,
+            system=m.system.name,
+            min_amount=m.min_amount,
+            model=PaymentMethodModel.model_validate(m, from_attributes=True),
+        )
+        for m in methods
+    )
+
+
+_catalogue = ReloadableCache(
+    _load_entries,
+    depends_on=(
+        PaymentMethod._meta.label_lower,
+        PaymentSystem._meta.label_lower,
+    ),
+)
+
+
+def _filter_methods(
+    entries: tuple[CatalogueEntry, ...],
+    order_price: float,
+    order_type: Item,
+    principal_kind: AuthType,
+) -> list[PaymentMethodModel]:
+    result = []
+    for entry in entries:
+        if entry.min_amount > order_price:
+            continue
+        if entry.is_ton_connect:
+            if principal_kind != "user":
+                continue
+        elif order_type == "ton":
+            continue
+        result.append(entry.model)
+    return result
+
+
+def get_available_methods(
+    order_price: float, order_type: Item, principal_kind: AuthType
+) -> list[PaymentMethodModel]:
+    """
+    Методы оплаты, доступные для суммы и типа заказа.
+
+    * TonConnect доступен только пользователю.
+    * Для `order_type == "ton"` остаётся **только** TonConnect.
+    """
+    return _filter_methods(_catalogue.get(), order_price, order_type, principal_kind)
+
+
+async def aget_available_methods(
+    order_price: float, order_type: Item, principal_kind: AuthType
+) -> list[PaymentMethodModel]:
+    """Async-версия `get_available_methods`."""
+    return _filter_methods(
+        await _catalogue.aget(), order_price, order_type, principal_kind
+    )
@@ -0,0 +1,209 @@
+"""
+Таблица цен (quote engine).
+
+Все публичные цены — премиум, Stars, TON и подарки — считаются одним проходом
+в неизменяемую `PriceTable` с уже применённой наценкой, в USD и RUB, по одному
+снимку курсов. Таблица публикуется одним ключом Redis (атомарно), её
+пересобирает `price_table_worker`; обработчики запросов только читают её и
+никогда не ходят за ценами в БД или сеть сами.
+
+Ключ таблицы живёт без TTL: новая таблица перезаписывает старую, поэтому
+читатели всегда получают последнюю собранную. Изменение `Price` лишь помечает
+таблицу устаревшей, и воркер пересобирает её в течение секунды. Таблица
+старше `price_table_max_age` (Fragment или воркер долго недоступны) не
+отдаётся: её курс TON уже нельзя использовать для выставления счетов.
+"""
+
+import time
+
+from pydantic import BaseModel, ConfigDict
+
+from django_stars.stars_app.models import Price
+from fastapi_stars.schemas.info import PricesWithCurrency, PriceWithCurrency
+from fastapi_stars.settings import settings
+from integrations.Currencies import RatesSnapshot
+from integrations.fragment import FragmentAPI
+from integrations.telegram_bot import bot
+from integrations.utils.cache import cache_key, get_async_redis, redis_client
+from integrations.wallet.helpers import get_wallet
+
+TABLE_KEY = cache_key("price_table")
+# Флаг «пересобрать вне очереди»: ставят изменение `Price` и читатели при промахе
+STALE_KEY = cache_key("price_table_stale")
+
+PREMIUM_MONTHS = {
+    Price.Type.PREMIUM_3: 3,
+    Price.Type.PREMIUM_6: 6,
+    Price.Type.PREMIUM_12: 12,
+}
+
+
+class Quote(BaseModel):
+    """Цена единицы товара: с наценкой (USD, RUB) и закупочная (`white_usd`)."""
+
+    model_config = ConfigDict(frozen=True)
+
+    usd: float
+    rub: float
+    white_usd: float
+
+    def prices(self, amount: float = 1) -> PricesWithCurrency:
+        return PricesWithCurrency(
+            price_usd=PriceWithCurrency(currency="usd", price=self.usd * amount),
+            price_rub=PriceWithCurrency(currency="rub", price=self.rub * amount),
+        )
+
+
+class GiftQuote(Quote):
+    id: str
+    emoji: str
+    star_count: int
+
+
+class PriceTableUnavailable(Exception):
+    """Таблица ещё не собрана (первый запуск, очищенный Redis) или устарела."""
+
+
+class PriceTable(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    built_at: float
+    ton_usd: float
+    usdt_rub: float
+    star: Quote  # за 1 Star
+    ton: Quote  # за 1 TON
+    premium: dict[int, Quote]  # по числу месяцев
+    gifts: tuple[GiftQuote, ...]  # по возрастанию star_count
+
+    def gift(self, gift_id: str) -> GiftQuote | None:
+        return next((gift for gift in self.gifts if gift.id == gift_id), None)
+
+    def usd_to_rub(self, usd: float) -> float:
+        return float(float(usd) * self.usdt_rub)
+
+    def usd_to_ton(self, usd: float) -> float:
+        return float(float(usd) / self.ton_usd)
+
+
+def _quote(white_usd: float, markup: float, usdt_rub: float) -> Quote:
+    usd = float(white_usd + white_usd * markup / 100)
+    return Quote(usd=usd, rub=usd * usdt_rub, white_usd=white_usd)
+
+
+def build_price_table() -> PriceTable:
+    """Собирает таблицу: БД (премиум), Fragment (Stars), бот (подарки), курсы."""
+    rates = RatesSnapshot.fetch()
+    usdt_rub = rates.usdt_rub
+
+    premium = {
+        PREMIUM_MONTHS[price.type]: Quote(
+            usd=price.price,
+            rub=price.price * usdt_rub,
+            white_usd=price.white_price,
+        )
+        for price in Price.objects.all()
+        if price.type in PREMIUM_MONTHS
+    }
+
+    fragment = FragmentAPI(get_wallet())
+    white_per_star = fragment.get_stars_price(500).usd / 500
+
+    available = filter(
+        lambda x: x.id in settings.available_gifts, bot.get_available_gifts().gifts
+    )
+    gifts = []
+    for gift in sorted(available, key=lambda x: x.star_count):
+        white = gift.star_count * white_per_star
+        usd = round(white + white / 100 * settings.gifts_markup, 2)
+        gifts.append(
+            GiftQuote(
+                id=gift.id,
+                emoji=gift.sticker.emoji,
+                star_count=gift.star_count,
+                usd=usd,
+                rub=usd * usdt_rub,
+                white_usd=white,
+            )
+        )
+
+    return PriceTable(
+        built_at=time.time(),
+        ton_usd=rates.ton_usd,
+        usdt_rub=usdt_rub,
+        star=_quote(white_per_star, settings.stars_markup, usdt_rub),
+        ton=_quote(rates.ton_usd, settings.ton_markup, usdt_rub),
+        premium=premium,
+        gifts=tuple(gifts),
+    )
+
+
+def publish_price_table(table: PriceTable) -> None:
+    redis_client.set(TABLE_KEY, table.model_dump_json())
+
+
+def refresh_price_table() -> PriceTable:
+    table = build_price_table()
+    publish_price_table(table)
+    return table
+
+
+def mark_price_table_stale() -> None:
+    """Просит воркер пересобрать таблицу; до тех пор читается текущая."""
+    redis_client.set(STALE_KEY, 1)
+
+
+def take_stale_flag() -> bool:
+    """Снимает флаг до сборки, чтобы изменение во время сборки не потерялось."""
+    return redis_client.getdel(STALE_KEY) is not None
+
+
+# Последняя разобранная таблица процесса: (сырой JSON, таблица)
+_parsed: tuple[str, PriceTable] | None = None
+
+
+def _parse(raw: str) -> PriceTable:
+    global _parsed
+    parsed = _parsed
+    if parsed is not None and parsed[0] == raw:
+        return parsed[1]
+    table = PriceTable.model_validate_json(raw)
+    _parsed = (raw, table)
+    return table
+
+
+def _fresh(table: PriceTable) -> PriceTable:
+    age = time.time() - table.built_at
+    if age > settings.price_table_max_age:
+        raise PriceTableUnavailable(f"Price table is {age:.0f}s old")
+    return table
+
+
+def _last_parsed() -> PriceTable:
+    if _parsed is None:
+        raise PriceTableUnavailable("Price table has not been built yet")
+    return _fresh(_parsed[1])
+
+
+def get_price_table() -> PriceTable:
+    """
+    Текущая таблица цен — один GET из Redis.
+
+    Если ключа нет, отдаётся последняя таблица процесса и воркер просится
+    пересобрать её. `PriceTableUnavailable` — если процесс таблицы ещё не видел
+    или она старше `price_table_max_age`.
+    """
+    raw = redis_client.get(TABLE_KEY)
+    if raw is not None:
+        return _fresh(_parse(raw))
+    mark_price_table_stale()
+    return _last_parsed()
+
+
+async def aget_price_table() -> PriceTable:
+    """`get_price_table()` для async-кода."""
+    redis = get_async_redis()
+    raw = await redis.get(TABLE_KEY)
+    if raw is not None:
+        return _fresh(_parse(raw))
+    await redis.set(STALE_KEY, 1)
+    return _last_parsed()
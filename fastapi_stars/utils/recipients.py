@@ -0,0 +1,87 @@
+"""
+Общий кэш проверенных получателей.
+
+`/info/validate_user` сохраняет найденного получателя целиком (id получателя во
+Fragment, имя, фото), а `/orders/create` берёт его отсюда: в обычном сценарии
+фронтенд проверяет username прямо перед оформлением, и повторный запрос во
+Fragment при создании заказа не нужен. Без записи в кэше — холодный запрос.
+"""
+
+import re
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+
+from fastapi_stars.schemas.info import Item
+from integrations.fragment import FragmentAPI
+from integrations.fragment.types import PremiumRecipient, StarsRecipient
+from integrations.utils.cache import cache_key, get_async_redis
+
+RECIPIENT_TTL = 300
+
+
+class RecipientRecord(BaseModel):
+    """Получатель, прошедший проверку. Для `gift` `recipient` не заполняется."""
+
+    recipient: str | None = None
+    name: str | None = None
+    photo: str | None = None  # уже URL, без обёртки из ответа Fragment
+
+    @classmethod
+    def from_fragment(
+        cls, found: StarsRecipient | PremiumRecipient
+    ) -> "RecipientRecord":
+        return cls(
+            recipient=found.recipient,
+            name=found.name,
+            photo=re.findall(r'"([^"]+)"', found.photo)[0] if found.photo else None,
+        )
+
+
+def recipient_key(username: str, order_type: Item) -> str:
+    # username в Telegram регистронезависим
+    return cache_key("recipient", order_type, username.lower())
+
+
+async def remember_recipient(
+    username: str, order_type: Item, record: RecipientRecord
+) -> None:
+    await get_async_redis().set(
+        recipient_key(username, order_type),
+        record.model_dump_json(),
+        ex=RECIPIENT_TTL,
+    )
+
+
+async def cached_recipient(username: str, order_type: Item) -> RecipientRecord | None:
+    raw = await get_async_redis().get(recipient_key(username, order_type))
+    if raw is None:
+        return None
+    return RecipientRecord.model_validate_json(raw)
+
+
+_LOOKUPS = {
+    "star": FragmentAPI.get_stars_recipient,
+    "premium": FragmentAPI.get_premium_recipient,
+    "ton": FragmentAPI.get_ton_recipient,
+}
+
+
+async def resolve_recipient(
+    fragment: FragmentAPI, username: str, order_type: Item
+) -> RecipientRecord:
+    """
+    Получатель для заказа `star`/`premium`/`ton`.
+
+    Берётся из записи, оставленной `/info/validate_user`; при промахе — запрос
+    во Fragment (результат тоже кэшируется).
+
+    :raises ValueError: получатель не найден
+    """
+    record = await cached_recipient(username, order_type)
+    if record is not None:
+        return record
+    found = await run_in_threadpool(_LOOKUPS[order_type], fragment, username)
+    record = RecipientRecord.from_fragment(found)
+    await remember_recipient(username, order_type, record)
+    return record
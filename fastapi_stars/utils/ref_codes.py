@@ -0,0 +1,61 @@
+"""
+Разрешение реферального кода (TON-адрес или `ref_alias`) в кошелёк рефовода.
+
+Код → кошелёк кэшируется в Redis отдельным ключом `stars_site:ref_code:<код>`
+на `CODE_TTL`, поэтому выдача гостевого токена по реферальной ссылке обычно
+обходится без БД. Ключи заполняются лениво при промахах; `/users/ref_alias`
+обновляет их сразу. TTL ограничивает жизнь записи, которую промах, читавший
+БД во время смены алиаса, мог записать уже после `update_alias`.
+Несуществующие коды кэшируются отдельно и ненадолго.
+"""
+
+from django_stars.stars_app.models import User
+from integrations.utils.cache import cache_key, get_async_redis
+
+CODE_TTL = 3600
+MISS_TTL = 300
+
+
+def _code_key(code: str) -> str:
+    return cache_key("ref_code", code)
+
+
+def _miss_key(code: str) -> str:
+    return cache_key("ref_code_miss", code)
+
+
+async def resolve_ref_code(code: str, is_wallet: bool) -> str | None:
+    """
+    Кошелёк рефовода по коду или None, если такого пользователя нет.
+
+    :param code: Нормализованный адрес или алиас
+    :param is_wallet: `code` — адрес (ищется по `wallet_address`, иначе по алиасу)
+    """
+    redis = get_async_redis()
+    wallet = await redis.get(_code_key(code))
+    if wallet is not None:
+        return wallet
+    if await redis.exists(_miss_key(code)):
+        return None
+    lookup = {"wallet_address": code} if is_wallet else {"ref_alias": code}
+    wallet = (
+        await User.objects.filter(**lookup)
+        .values_list("wallet_address", flat=True)
+        .afirst()
+    )
+    if wallet is None:
+        await redis.set(_miss_key(code), 1, ex=MISS_TTL)
+        return None
+    await redis.set(_code_key(code), wallet, ex=CODE_TTL)
+    return wallet
+
+
+async def update_alias(old_alias: str | None, new_alias: str, wallet: str) -> None:
+    """Переносит алиас пользователя в кэш после сохранения в БД."""
+    redis = get_async_redis()
+    async with redis.pipeline(transaction=True) as pipe:
+        if old_alias and old_alias != new_alias:
+            pipe.delete(_code_key(old_alias))
+        pipe.set(_code_key(new_alias), wallet, ex=CODE_TTL)
+        pipe.delete(_miss_key(new_alias))
+        await pipe.execute()
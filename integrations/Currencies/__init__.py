@@ -1,101 +1,112 @@
-import json
+import time
+from typing import Iterable
 
-import redis
-import requests
+from loguru import logger
 
-r = redis.Redis(host="localhost", port=6379, decode_responses=True)
+from integrations.utils.cache import get_async_redis, redis_client as r
+from .convert import divide, multiply
+from .feeder import meta_key, rates_feeder_worker
+from .snapshot import RatesSnapshot, aget_rates, get_rates, rates_scope
+
+# Последнее значение из метаданных фидера старше этого считается недоступным
+MAX_STALENESS = 3600
+
+
+class RateUnavailable(Exception):
+    """Фидер курсов ни разу не публиковал курс или он слишком устарел."""
+
+
+def _from_meta(key: str, meta: list[str | None]) -> float:
+    if meta[0] is None:
+        raise RateUnavailable(key)
+    age = time.time() - float(meta[1])
+    if age > MAX_STALENESS:
+        raise RateUnavailable(f"{key} is {age:.0f}s old")
+    logger.warning(f"Rate {key} is stale ({age:.0f}s), feeder is lagging")
+    return float(meta[0])
+
+
+def read_rate(key: str) -> float:
+    """
+    Курс, опубликованный фидером (`integrations.Currencies.feeder`).
+
+    Сетевых запросов не делает: если короткоживущий ключ истёк, берётся
+    последнее значение из метаданных фидера.
+    """
+    rate = r.get(key)
+    if rate is not None:
+        return float(rate)
+    return _from_meta(key, r.hmget(meta_key(key), "value", "updated_at"))
+
+
+async def aread_rate(key: str) -> float:
+    """`read_rate` на async-клиенте Redis."""
+    redis = get_async_redis()
+    rate = await redis.get(key)
+    if rate is not None:
+        return float(rate)
+    return _from_meta(key, await redis.hmget(meta_key(key), "value", "updated_at"))
 
 
 class TON:
     @classmethod
-    def ton_to_usd(cls, usd: float, rate: float | None = None):
-        rate = cls.get_rate()
-        return float(float(usd) * rate)
+    def ton_to_usd(cls, ton: float, rate: float | None = None):
+        rate = cls.get_rate() if rate is None else rate
+        return float(float(ton) * rate)
 
     @classmethod
-    def usd_to_ton(cls, ton: float, rate: float | None = None):
-        rate = cls.get_rate()
-        return float(float(ton) / rate)
+    def usd_to_ton(cls, usd: float, rate: float | None = None):
+        rate = cls.get_rate() if rate is None else rate
+        return float(float(usd) / rate)
+
+    @classmethod
+    def ton_to_usd_many(cls, amounts: Iterable[float], rate: float | None = None):
+        """Пересчёт последовательности/массива NumPy с одним чтением курса."""
+        return multiply(amounts, cls.get_rate() if rate is None else rate)
+
+    @classmethod
+    def usd_to_ton_many(cls, amounts: Iterable[float], rate: float | None = None):
+        return divide(amounts, cls.get_rate() if rate is None else rate)
 
     @staticmethod
     def get_rate() -> float:
-        try:
-            rate = float(r.get("ton_rate"))
-        except TypeError:
-            rate = None
-        if rate is not None:
-            return rate
-        rate = None
-        tries = 0
-        s = requests.session()
-        while tries < 3:
-            tries += 1
-            try:
-                response = s.get(
-                    "https://www.okx.com/api/v5/public/mark-price?instId=TON-USDT"
-                ).json()
-            except json.JSONDecodeError:
-                continue
-            try:
-                rate = float(response["data"][0]["markPx"])
-            except (json.JSONDecodeError, KeyError, ValueError):
-                continue
-            else:
-                break
-        if rate:
-            r.set("ton_rate", rate, ex=30)
-        return rate
+        return read_rate("ton_rate")
 
 
 class USDT:
     @classmethod
-    def rub_to_usd(cls, usd: float):
-        rate = cls.get_rate()
-        return float(float(usd) / rate)
+    def rub_to_usd(cls, rub: float, rate: float | None = None):
+        rate = cls.get_rate() if rate is None else rate
+        return float(float(rub) / rate)
+
+    @classmethod
+    def usd_to_rub(cls, usd: float, rate: float | None = None):
+        rate = cls.get_rate() if rate is None else rate
+        return float(float(usd) * rate)
+
+    @classmethod
+    def rub_to_usd_many(cls, amounts: Iterable[float], rate: float | None = None):
+        return divide(amounts, cls.get_rate() if rate is None else rate)
 
     @classmethod
-    def usd_to_rub(cls, usdt: float):
-        rate = cls.get_rate()
-        return float(float(usdt) * rate)
+    def usd_to_rub_many(cls, amounts: Iterable[float], rate: float | None = None):
+        """Пересчёт последовательности/массива NumPy с одним чтением курса."""
+        return multiply(amounts, cls.get_rate() if rate is None else rate)
 
     @staticmethod
     def get_rate() -> float:
-        try:
-            rate = float(r.get("usdt_rate_rapira"))
-        except TypeError:
-            rate = None
-        if rate is not None:
-            return rate
-        rate = None
-        tries = 0
-        s = requests.session()
-        while tries < 3:
-            tries += 1
-            try:
-                response = s.get("https://api.rapira.net/open/market/rates").json()
-            except json.JSONDecodeError:
-                continue
-            try:
-                for pair in response["data"]:
-                    if pair["symbol"] == "USDT/RUB":
-                        rate = float(pair["close"])
-            except (json.JSONDecodeError, KeyError, ValueError, TypeError):
-                continue
-            else:
-                break
-        if rate:
-            r.set("usdt_rate_rapira", rate, ex=30)
-            return rate
-        else:
-            from .cbrf import CBRF
-
-            rate = CBRF.get_rate("usd")
-            r.set("usdt_rate_rapira", rate, ex=30)
-
-            return rate
+        return read_rate("usdt_rate_rapira")
 
 
 __all__ = [
     "TON",
     "USDT",
+    "RateUnavailable",
+    "read_rate",
+    "aread_rate",
+    "RatesSnapshot",
+    "get_rates",
+    "aget_rates",
+    "rates_scope",
+    "rates_feeder_worker",
 ]
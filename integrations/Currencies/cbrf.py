@@ -1,34 +1,40 @@
-import json
-
-import redis
 import requests
 
-r = redis.Redis(host="localhost", port=6379, decode_responses=True)
+from integrations.utils.cache import redis_client as r
+
+from .sources import TIMEOUT
+
+CACHE_TTL = 3600
 
 
 class CBRF:
     @staticmethod
-    def get_rate(currency: str = "USD") -> float:
+    def get_rate(currency: str = "USD") -> float | None:
+        """
+        Получение курса валюты из кэша (без сетевых запросов)
+        :param currency: Код валюты
+        :return: Курс валюты или None, если фидер ещё не загрузил его
+        """
+        rate = r.get(f"cbrf_{currency.upper()}")
+        return float(rate) if rate is not None else None
+
+    @staticmethod
+    def fetch_rate(currency: str = "USD", session: requests.Session | None = None):
         """
-        Получение курса валюты
+        Загрузка курса валюты с cbr-xml-daily.ru; результат кэшируется на час
         :param currency: Код валюты
+        :param session: HTTP-сессия
         :return: Курс валюты
         """
-        rate = None
-        tries = 0
-        s = requests.session()
-        while tries < 3:
-            tries += 1
-            response = s.get("https://www.cbr-xml-daily.ru/daily_json.js")
-            try:
-                rate = float(
-                    response.json()["Valute"][currency]["Value"]
-                    / response.json()["Valute"][currency]["Nominal"]
-                )
-            except (json.JSONDecodeError, KeyError, ValueError):
-                continue
-            else:
-                break
-        if rate:
-            r.set(f"cbrf_{currency}", rate, ex=3600)
+        currency = currency.upper()
+        cached = CBRF.get_rate(currency)
+        if cached is not None:
+            return cached
+        response = (session or requests).get(
+            "https://www.cbr-xml-daily.ru/daily_json.js", timeout=TIMEOUT
+        )
+        response.raise_for_status()
+        valute = response.json()["Valute"][currency]
+        rate = float(valute["Value"] / valute["Nominal"])
+        r.set(f"cbrf_{currency}", rate, ex=CACHE_TTL)
         return rate
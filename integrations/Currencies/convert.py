@@ -0,0 +1,20 @@
+from typing import Iterable
+
+
+def _is_array(amounts) -> bool:
+    # NumPy не входит в зависимости проекта: массивы определяем по протоколу
+    return hasattr(amounts, "__array_ufunc__")
+
+
+def multiply(amounts: Iterable[float], rate: float):
+    """Умножает все суммы на курс; массив NumPy — одной векторной операцией."""
+    if _is_array(amounts):
+        return amounts * rate
+    return [float(amount) * rate for amount in amounts]
+
+
+def divide(amounts: Iterable[float], rate: float):
+    """Делит все суммы на курс; массив NumPy — одной векторной операцией."""
+    if _is_array(amounts):
+        return amounts / rate
+    return [float(amount) / rate for amount in amounts]
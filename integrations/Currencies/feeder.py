@@ -0,0 +1,158 @@
+"""
+Фидер курсов валют.
+
+Единственный код, который ходит за курсами в сеть. Раз в `INTERVAL` секунд
+опрашивает источники каждой пары, агрегирует ответы и публикует результат.
+TON/USD берётся медианой трёх бирж с отбрасыванием выбросов; у USDT/RUB один
+основной источник (Rapira), его ответ публикуется как есть, а курс ЦБ — только
+резерв, когда Rapira не ответила. Публикуются:
+
+* `ton_rate`, `usdt_rate_rapira` — значение с коротким TTL, читают API и воркеры;
+* `stars_site:rates_meta:<key>` — последнее значение без TTL, время обновления
+  и список источников; читатели берут его, если фидер перестал обновлять ключ.
+"""
+
+import json
+import statistics
+import threading
+import time
+from dataclasses import dataclass
+
+from loguru import logger
+
+from fastapi_stars.settings import settings
+from integrations.utils.cache import cache_key, redis_client as r
+from integrations.utils.metrics import WorkerProbe
+
+from .sources import (
+    BinanceSource,
+    BybitSource,
+    CBRFSource,
+    OKXSource,
+    RapiraSource,
+    RateSource,
+    StaticSource,
+)
+
+INTERVAL = 10
+RATE_TTL = 60
+# Ответы, отклоняющиеся от медианы больше чем на 5%, отбрасываются
+MAX_DEVIATION = 0.05
+LOCK_KEY = cache_key("rates_feeder_lock")
+# Дольше худшего обновления: все источники всех пар по таймауту, по очереди
+LOCK_TTL = 60
+
+
+class NoRateError(Exception):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Rate:
+    key: str
+    sources: tuple[RateSource, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Aggregated:
+    value: float
+    sources: tuple[str, ...]
+
+
+def meta_key(key: str) -> str:
+    return cache_key("rates_meta", key)
+
+
+def aggregate(quotes: dict[str, float]) -> Aggregated:
+    """Медиана ответов после отбрасывания выбросов."""
+    if not quotes:
+        raise NoRateError("No quotes")
+    median = statistics.median(quotes.values())
+    accepted = {
+        name: value
+        for name, value in quotes.items()
+        if abs(value - median) <= median * MAX_DEVIATION
+    }
+    outliers = {name: v for name, v in quotes.items() if name not in accepted}
+    if outliers:
+        logger.warning(f"Rejected outlier quotes: {outliers}")
+    if not accepted:
+        # Два ответивших источника, сильно расходящиеся между собой
+        raise NoRateError(f"Quotes disagree: {quotes}")
+    return Aggregated(
+        value=statistics.median(accepted.values()), sources=tuple(sorted(accepted))
+    )
+
+
+def collect(rate: Rate) -> dict[str, float]:
+    """Опрашивает основные источники, при неудаче — резервные."""
+    quotes = {}
+    for fallback in (False, True):
+        for source in rate.sources:
+            if source.fallback != fallback:
+                continue
+            try:
+                quotes[source.name] = source.fetch()
+            except Exception as e:
+                logger.warning(f"{rate.key}: {source!r} failed: {e!r}")
+        if quotes:
+            break
+    return quotes
+
+
+def publish(key: str, aggregated: Aggregated) -> None:
+    with r.pipeline() as pipe:
+        pipe.set(key, aggregated.value, ex=RATE_TTL)
+        pipe.hset(
+            meta_key(key),
+            mapping={
+                "value": aggregated.value,
+                "updated_at": time.time(),
+                "sources": json.dumps(aggregated.sources),
+            },
+        )
+        pipe.execute()
+
+
+def refresh(rate: Rate) -> Aggregated | None:
+    try:
+        aggregated = aggregate(collect(rate))
+    except NoRateError:
+        logger.error(f"{rate.key}: no source returned a rate")
+        return None
+    publish(rate.key, aggregated)
+    return aggregated
+
+
+def default_rates() -> tuple[Rate, ...]:
+    if settings.rates_stub:
+        return tuple(
+            Rate(key, (StaticSource(value),))
+            for key, value in settings.rates_stub.items()
+        )
+    return (
+        Rate("ton_rate", (OKXSource(), BybitSource(), BinanceSource())),
+        Rate("usdt_rate_rapira", (RapiraSource(), CBRFSource("USD"))),
+    )
+
+
+def rates_feeder_worker(rates: tuple[Rate, ...] | None = None):
+    rates = rates or default_rates()
+    probe = WorkerProbe("rates_feeder_worker")
+    while threading.main_thread().is_alive():
+        started = time.monotonic()
+        probe.beat()
+        try:
+            # Если запущено несколько экземпляров воркера, обновляет один за раз.
+            # Лок держится до конца обновления и снимается явно, а не по TTL.
+            lock = r.lock(LOCK_KEY, timeout=LOCK_TTL, blocking=False)
+            if lock.acquire():
+                try:
+                    for rate in rates:
+                        refresh(rate)
+                finally:
+                    lock.release()
+                probe.done(len(rates))
+        except Exception:
+            logger.exception("Error while refreshing rates")
+        time.sleep(max(0.0, INTERVAL - (time.monotonic() - started)))
@@ -0,0 +1,147 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Iterable, Iterator
+
+from integrations.utils.cache import get_async_redis, redis_client
+
+from .convert import divide, multiply
+
+KEYS = ("ton_rate", "usdt_rate_rapira")
+
+
+def _float(value: str | None) -> float | None:
+    return float(value) if value is not None else None
+
+
+@dataclass(frozen=True)
+class RatesSnapshot:
+    """
+    Курсы валют, прочитанные из Redis одним MGET.
+
+    Если ключа нет (истёк TTL), курс получается через `TON`/`USDT` —
+    только для этого курса и не больше одного раза на снимок. `afetch`
+    разрешает такие курсы сразу на async-клиенте, чтобы sync-чтение Redis не
+    попало в event loop; недоступный курс запоминается в `unavailable` и
+    поднимает `RateUnavailable` только при обращении к нему.
+    """
+
+    ton_raw: float | None
+    usdt_raw: float | None
+    unavailable: frozenset[str] = frozenset()
+
+    @classmethod
+    def fetch(cls) -> "RatesSnapshot":
+        return cls(*map(_float, redis_client.mget(KEYS)))
+
+    @classmethod
+    async def afetch(cls) -> "RatesSnapshot":
+        from integrations.Currencies import RateUnavailable, aread_rate
+
+        values = list(map(_float, await get_async_redis().mget(KEYS)))
+        unavailable = set()
+        for i, key in enumerate(KEYS):
+            if values[i] is None:
+                try:
+                    values[i] = await aread_rate(key)
+                except RateUnavailable:
+                    unavailable.add(key)
+        return cls(*values, unavailable=frozenset(unavailable))
+
+    def _check(self, key: str) -> None:
+        if key in self.unavailable:
+            from integrations.Currencies import RateUnavailable
+
+            raise RateUnavailable(key)
+
+    @cached_property
+    def ton_usd(self) -> float:
+        """Цена 1 TON в USD."""
+        if self.ton_raw is not None:
+            return self.ton_raw
+        self._check("ton_rate")
+        from integrations.Currencies import TON
+
+        return TON.get_rate()
+
+    @cached_property
+    def usdt_rub(self) -> float:
+        """Цена 1 USDT в RUB."""
+        if self.usdt_raw is not None:
+            return self.usdt_raw
+        self._check("usdt_rate_rapira")
+        from integrations.Currencies import USDT
+
+        return USDT.get_rate()
+
+    def usd_to_rub(self, usd: float) -> float:
+        return float(float(usd) * self.usdt_rub)
+
+    def rub_to_usd(self, rub: float) -> float:
+        return float(float(rub) / self.usdt_rub)
+
+    def ton_to_usd(self, ton: float) -> float:
+        return float(float(ton) * self.ton_usd)
+
+    def usd_to_ton(self, usd: float) -> float:
+        return float(float(usd) / self.ton_usd)
+
+    def usd_to_rub_many(self, amounts: Iterable[float]):
+        return multiply(amounts, self.usdt_rub)
+
+    def rub_to_usd_many(self, amounts: Iterable[float]):
+        return divide(amounts, self.usdt_rub)
+
+    def ton_to_usd_many(self, amounts: Iterable[float]):
+        return multiply(amounts, self.ton_usd)
+
+    def usd_to_ton_many(self, amounts: Iterable[float]):
+        return divide(amounts, self.ton_usd)
+
+
+class _Holder:
+    __slots__ = ("snapshot",)
+
+    def __init__(self) -> None:
+        self.snapshot: RatesSnapshot | None = None
+
+
+# Изменяемый holder, а не сам снимок: sync-эндпоинты выполняются в threadpool
+# с копией контекста, и присвоение ContextVar там не видно остальному запросу.
+_scope: ContextVar[_Holder | None] = ContextVar("rates_scope", default=None)
+
+
+@contextmanager
+def rates_scope() -> Iterator[None]:
+    """Внутри scope все вызовы `get_rates()` возвращают один и тот же снимок."""
+    token = _scope.set(_Holder())
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def get_rates() -> RatesSnapshot:
+    """
+    Снимок курсов для текущего запроса.
+
+    В рамках `rates_scope()` (middleware API) Redis читается не больше одного
+    раза; вне scope (воркеры, скрипты) каждый вызов читает свежие курсы.
+    """
+    holder = _scope.get()
+    if holder is None:
+        return RatesSnapshot.fetch()
+    if holder.snapshot is None:
+        holder.snapshot = RatesSnapshot.fetch()
+    return holder.snapshot
+
+
+async def aget_rates() -> RatesSnapshot:
+    """`get_rates()` для async-кода: тот же снимок, async-клиент Redis."""
+    holder = _scope.get()
+    if holder is None:
+        return await RatesSnapshot.afetch()
+    if holder.snapshot is None:
+        holder.snapshot = await RatesSnapshot.afetch()
+    return holder.snapshot
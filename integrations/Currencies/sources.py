@@ -0,0 +1,120 @@
+from abc import ABC, abstractmethod
+
+import requests
+
+TIMEOUT = 5
+
+
+class RateSource(ABC):
+    """
+    Источник курса валютной пары.
+
+    `fetch()` ходит в сеть и вызывается только фидером курсов
+    (`integrations.Currencies.feeder`), но не обработчиками запросов.
+
+    `fallback=True` — источник используется, только если ни один основной
+    источник пары не ответил (например, курс ЦБ вместо биржевого USDT/RUB).
+    """
+
+    name: str
+    fallback: bool = False
+
+    def __init__(self, session: requests.Session | None = None) -> None:
+        self._http = session or requests.Session()
+
+    @abstractmethod
+    def fetch(self) -> float: ...
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name}>"
+
+
+class OKXSource(RateSource):
+    """Mark price TON-USDT на OKX."""
+
+    name = "okx"
+
+    def fetch(self) -> float:
+        response = self._http.get(
+            "https://www.okx.com/api/v5/public/mark-price",
+            params={"instId": "TON-USDT"},
+            timeout=TIMEOUT,
+        )
+        response.raise_for_status()
+        return float(response.json()["data"][0]["markPx"])
+
+
+class BybitSource(RateSource):
+    """Последняя цена TON-USDT на споте Bybit."""
+
+    name = "bybit"
+
+    def fetch(self) -> float:
+        response = self._http.get(
+            "https://api.bybit.com/v5/market/tickers",
+            params={"category": "spot", "symbol": "TONUSDT"},
+            timeout=TIMEOUT,
+        )
+        response.raise_for_status()
+        return float(response.json()["result"]["list"][0]["lastPrice"])
+
+
+class BinanceSource(RateSource):
+    """Последняя цена TON-USDT на споте Binance."""
+
+    name = "binance"
+
+    def fetch(self) -> float:
+        response = self._http.get(
+            "https://api.binance.com/api/v3/ticker/price",
+            params={"symbol": "TONUSDT"},
+            timeout=TIMEOUT,
+        )
+        response.raise_for_status()
+        return float(response.json()["price"])
+
+
+class RapiraSource(RateSource):
+    """Последняя цена USDT/RUB на Rapira."""
+
+    name = "rapira"
+
+    def fetch(self) -> float:
+        response = self._http.get(
+            "https://api.rapira.net/open/market/rates", timeout=TIMEOUT
+        )
+        response.raise_for_status()
+        for pair in response.json()["data"]:
+            if pair["symbol"] == "USDT/RUB":
+                return float(pair["close"])
+        raise KeyError("USDT/RUB")
+
+
+class CBRFSource(RateSource):
+    """Официальный курс ЦБ РФ для `currency` (за 1 единицу)."""
+
+    name = "cbrf"
+    fallback = True
+
+    def __init__(
+        self, currency: str = "USD", session: requests.Session | None = None
+    ) -> None:
+        super().__init__(session)
+        self.currency = currency
+
+    def fetch(self) -> float:
+        from .cbrf import CBRF
+
+        return CBRF.fetch_rate(self.currency, self._http)
+
+
+class StaticSource(RateSource):
+    """Фиксированный курс — для тестов и локальной разработки без сети."""
+
+    def __init__(self, value: float, name: str = "static") -> None:
+        super().__init__()
+        self.value = float(value)
+        self.name = name
+
+    def fetch(self) -> float:
+        return self.value
@@ -4,6 +4,7 @@ import requests
 from loguru import logger
 from pydantic import BaseModel
 
+from integrations.utils.metrics import timed
 from ..models import BillSchema
 
 
@@ -23,6 +24,7 @@ class CardLink:
         self.__shop_id = shop_id
         self.__shop_key = shop_key
 
+    @timed("merchant", "cardlink")
     def create_bill(
         self, order_id: str, amount: float, method: str = None
     ) -> BillSchema:
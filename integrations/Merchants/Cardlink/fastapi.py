@@ -1,45 +1,50 @@
 from hashlib import md5
-from typing import Annotated
 
-from fastapi import APIRouter, Form
+from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
 from loguru import logger
 
-from django_stars.stars_app.models import PaymentSystem, Payment
+from django_stars.stars_app.models import PaymentSystem
+from integrations.Merchants.credentials import MerchantCredentials
+from integrations.Merchants.webhooks import (
+    MerchantWebhook,
+    RawWebhook,
+    Reply,
+    Verified,
+    WebhookRejected,
+)
 
 router = APIRouter()
 
+FAIL = Reply("fail", 400)
 
-@router.post("/cardlink", response_class=HTMLResponse)
-def cardlink(
-    amount: Annotated[str, Form(alias="OutSum")],
-    payment_id: Annotated[str, Form(alias="InvId")],
-    signature: Annotated[str, Form(alias="SignatureValue")],
-    status: Annotated[str, Form(alias="Status")],
-):
-    try:
-        payment_system = PaymentSystem.objects.get(name=PaymentSystem.Names.CARDLINK)
-    except PaymentSystem.DoesNotExist:
-        return HTMLResponse("fail", status_code=400)
+
+def verify(raw: RawWebhook, credentials: MerchantCredentials) -> Verified:
+    form = raw.form()
+    amount = form.get("OutSum")
+    payment_id = form.get("InvId")
     local_signature = (
-        md5(f"{amount}:{payment_id}:{payment_system.access_key}".encode())
+        md5(f"{amount}:{payment_id}:{credentials.access_key}".encode())
         .hexdigest()
         .upper()
     )
-    if local_signature == signature:
-        if status != "SUCCESS":
-            return HTMLResponse("fail", 400)
-        payment_id = payment_id
-        payment = Payment.objects.filter(id=payment_id).first()
-        if not payment:
-            logger.debug(f"Cardlink: Payment with ID {payment_id} not found.")
-            return HTMLResponse("fail", 400)
-        payment.refresh_from_db(fields=("status",))
-        if payment.status != payment.Status.CREATED:
-            logger.debug(f"Cardlink: Payment {payment_id} already processed.")
-            return HTMLResponse("fail", 400)
-        payment.status = payment.Status.CONFIRMED
-        payment.save(update_fields=("status",))
-        return HTMLResponse("ok", 200)
-    logger.debug("Cardlink: Signature mismatch.")
-    return HTMLResponse("fail", status_code=400)
+    if local_signature != form.get("SignatureValue"):
+        logger.debug("Cardlink: Signature mismatch.")
+        raise WebhookRejected(FAIL)
+    if form.get("Status") != "SUCCESS":
+        raise WebhookRejected(FAIL)
+    return Verified(payment_id)
+
+
+webhook = MerchantWebhook(
+    provider=PaymentSystem.Names.CARDLINK,
+    verify=verify,
+    ok=Reply("ok"),
+    not_confirmed=FAIL,
+    no_credentials=FAIL,
+)
+
+
+@router.post("/cardlink", response_class=HTMLResponse)
+async def cardlink(request: Request):
+    return await webhook.handle(request)
@@ -2,6 +2,7 @@ from typing import Optional
 
 import requests
 
+from integrations.utils.metrics import timed
 from ..models import BillSchema
 
 
@@ -31,6 +32,7 @@ class CryptoPay:
     def get_me(self):
         return self.__request("getMe")
 
+    @timed("merchant", "cryptopay")
     def create_bill(
         self,
         payment_id: str,
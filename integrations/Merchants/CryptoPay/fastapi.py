@@ -1,45 +1,49 @@
-import asyncio
-import hashlib
 import hmac
 import json
 
-from fastapi import APIRouter, Header, Request
+from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
+from loguru import logger
 
-from django_stars.stars_app.models import PaymentSystem, Payment
+from django_stars.stars_app.models import PaymentSystem
+from integrations.Merchants.credentials import MerchantCredentials
+from integrations.Merchants.webhooks import (
+    IGNORED,
+    MerchantWebhook,
+    RawWebhook,
+    Reply,
+    Verified,
+    WebhookRejected,
+)
 
 router = APIRouter()
 
+FAIL = Reply("fail")
+
+
+def verify(raw: RawWebhook, credentials: MerchantCredentials) -> Verified:
+    if not credentials.hmac_secret:
+        raise WebhookRejected(FAIL)
+    signature = raw.headers.get("crypto-pay-api-signature")
+    local_signature = hmac.new(credentials.hmac_secret, raw.body, "sha256").hexdigest()
+    if local_signature != signature:
+        logger.error(f"CryptoPay: Signature mismatch {signature} {local_signature}")
+        raise WebhookRejected(FAIL)
+    invoice = json.loads(raw.body)["payload"]
+    if invoice["status"] != "paid":
+        return IGNORED
+    return Verified(invoice["payload"], str(invoice.get("invoice_id", "")) or None)
+
+
+webhook = MerchantWebhook(
+    provider=PaymentSystem.Names.CRYPTOPAY,
+    verify=verify,
+    ok=Reply("ok"),
+    not_confirmed=FAIL,
+    no_credentials=FAIL,
+)
+
 
 @router.post("/cryptopay", response_class=HTMLResponse)
-def cryptopay(
-    request: Request, signature: str = Header(alias="crypto-pay-api-signature")
-):
-    try:
-        payment_system = PaymentSystem.objects.get(name=PaymentSystem.Names.CRYPTOPAY)
-    except PaymentSystem.DoesNotExist:
-        return "fail"
-    data = asyncio.run(request.body())
-    secret = hashlib.sha256(payment_system.access_key.encode()).digest()
-    local_signature = hmac.new(
-        secret,
-        data,
-        "sha256",
-    ).hexdigest()
-    if local_signature == signature:
-        invoice = json.loads(data)["payload"]
-        if invoice["status"] != "paid":
-            return "ok"
-        payment_id = invoice["payload"]
-        payment = Payment.objects.filter(id=payment_id).first()
-        if not payment:
-            return "fail"
-        if payment.status != payment.Status.CREATED:
-            return "fail"
-        payment.status = Payment.Status.CONFIRMED
-        payment.save(update_fields=("status",))
-        return "ok"
-    print(signature, local_signature)
-    with open("cryptopay.json", "wb") as f:
-        f.write(data)
-    return "fail"
+async def cryptopay(request: Request):
+    return await webhook.handle(request)
@@ -1,44 +1,52 @@
 import hashlib
 
-from fastapi import APIRouter, Form
+from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
 
-from django_stars.stars_app.models import PaymentSystem, Payment
+from django_stars.stars_app.models import PaymentSystem
+from integrations.Merchants.credentials import MerchantCredentials
+from integrations.Merchants.webhooks import (
+    MerchantWebhook,
+    RawWebhook,
+    Reply,
+    Verified,
+    WebhookRejected,
+)
 
 router = APIRouter()
 
+# FreeKassa повторяет уведомление, пока не получит "YES"
+YES = Reply("YES")
 
-# noinspection PyPep8Naming
-@router.post("/freekassa", response_class=HTMLResponse)
-def freekassa(
-    MERCHANT_ID=Form(None),
-    AMOUNT=Form(None),
-    MERCHANT_ORDER_ID=Form(None),
-    SIGN=Form(None),
-):
-    try:
-        payment_system = PaymentSystem.objects.get(name=PaymentSystem.Names.FREEKASSA)
-    except PaymentSystem.DoesNotExist:
-        return "fail"
+
+def verify(raw: RawWebhook, credentials: MerchantCredentials) -> Verified:
+    if len(credentials.secret_parts) < 2:
+        raise WebhookRejected(Reply("fail"))
+    form = raw.form()
     sign_list = map(
         str,
         [
-            MERCHANT_ID,
-            AMOUNT,
-            payment_system.secret_key.split(",")[1],
-            MERCHANT_ORDER_ID,
+            form.get("MERCHANT_ID"),
+            form.get("AMOUNT"),
+            credentials.secret_parts[1],
+            form.get("MERCHANT_ORDER_ID"),
         ],
     )
-    md5 = hashlib.md5()
-    sign = ":".join(sign_list).encode()
-    md5.update(sign)
-    sign = md5.hexdigest()
-    if SIGN == sign:
-        payment_id = MERCHANT_ORDER_ID
-        payment = Payment.objects.filter(id=payment_id).first()
-        if not payment or payment.status != payment.Status.CREATED:
-            return "YES"
-        payment.status = Payment.Status.CONFIRMED
-        payment.save(update_fields=("status",))
-        return "YES"
-    return "YES"
+    sign = hashlib.md5(":".join(sign_list).encode()).hexdigest()
+    if form.get("SIGN") != sign:
+        raise WebhookRejected(YES)
+    return Verified(form.get("MERCHANT_ORDER_ID"), form.get("intid"))
+
+
+webhook = MerchantWebhook(
+    provider=PaymentSystem.Names.FREEKASSA,
+    verify=verify,
+    ok=YES,
+    not_confirmed=YES,
+    no_credentials=Reply("fail"),
+)
+
+
+@router.post("/freekassa", response_class=HTMLResponse)
+async def freekassa(request: Request):
+    return await webhook.handle(request)
@@ -7,6 +7,8 @@ import requests
 from loguru import logger
 from pydantic import BaseModel
 
+from integrations.utils.metrics import timed
+
 
 class BillSchema(BaseModel):
     status: bool = True
@@ -39,6 +41,7 @@ class FreeKassa:
         self.__shop_secret = shop_secret
         self.__shop_api_key = shop_api_Key
 
+    @timed("merchant", "freekassa")
     def create_bill(
         self, order_id: str, amount: float, method: str, buyer_ip: str, email: str
     ) -> BillSchema:
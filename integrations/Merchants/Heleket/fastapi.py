@@ -2,25 +2,33 @@ from base64 import b64encode
 from hashlib import md5
 
 import ujson
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
 from loguru import logger
 
-from django_stars.stars_app.models import PaymentSystem, Payment
+from django_stars.stars_app.models import PaymentSystem
+from integrations.Merchants.credentials import MerchantCredentials
+from integrations.Merchants.webhooks import (
+    MerchantWebhook,
+    RawWebhook,
+    Reply,
+    Verified,
+    WebhookRejected,
+)
 
 router = APIRouter()
 
+FAIL = Reply("Fail", 500)
 
-@router.post("/heleket", response_class=HTMLResponse)
-def heleket(data=Body()):
-    if not isinstance(data, dict):
-        return HTMLResponse("Fail", 500)
+
+def verify(raw: RawWebhook, credentials: MerchantCredentials) -> Verified:
     try:
-        payment_system = PaymentSystem.objects.get(name=PaymentSystem.Names.HELEKET)
-    except PaymentSystem.DoesNotExist:
-        return HTMLResponse("fail", status_code=400)
-    sign = data.get("sign")
-    del data["sign"]
+        data = raw.json()
+    except ValueError:
+        raise WebhookRejected(FAIL)
+    if not isinstance(data, dict):
+        raise WebhookRejected(FAIL)
+    sign = data.pop("sign", None)
     local_signature = md5(
         b64encode(
             ujson.dumps(
@@ -30,18 +38,23 @@ def heleket(data=Body()):
                 escape_forward_slashes=True,
             ).encode("utf-8")
         )
-        + payment_system.access_key.encode("utf-8")
+        + credentials.access_key.encode("utf-8")
     ).hexdigest()
     if local_signature != sign:
         logger.error(f"Wrong sign {local_signature} {sign}")
-        return HTMLResponse("Fail", 400)
-    payment = Payment.objects.filter(id=data["order_id"]).first()
-    if not payment:
-        logger.error("Not exist")
-        return HTMLResponse("Fail", 500)
-    if payment.status != payment.Status.CREATED:
-        logger.error("Bad status")
-        return HTMLResponse("Fail", 500)
-    payment.status = payment.Status.CONFIRMED
-    payment.save(update_fields=("status",))
-    return "ok"
+        raise WebhookRejected(Reply("Fail", 400))
+    return Verified(data.get("order_id"), data.get("uuid"))
+
+
+webhook = MerchantWebhook(
+    provider=PaymentSystem.Names.HELEKET,
+    verify=verify,
+    ok=Reply("ok"),
+    not_confirmed=FAIL,
+    no_credentials=Reply("fail", 400),
+)
+
+
+@router.post("/heleket", response_class=HTMLResponse)
+async def heleket(request: Request):
+    return await webhook.handle(request)
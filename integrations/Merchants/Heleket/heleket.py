@@ -6,6 +6,7 @@ import requests
 from loguru import logger
 
 from fastapi_stars.settings import settings
+from integrations.utils.metrics import timed
 from ..models import BillSchema
 
 
@@ -18,6 +19,7 @@ class Heleket:
         self.__shop_id = shop_id
         self.__shop_key = key
 
+    @timed("merchant", "heleket")
     def create_bill(
         self, order_id: str, amount: float, success_url: str | None = None
     ) -> BillSchema:
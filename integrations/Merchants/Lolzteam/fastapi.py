@@ -1,36 +1,50 @@
-from fastapi import APIRouter, Body, Header
+from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
 from loguru import logger
 
-from django_stars.stars_app.models import PaymentSystem, Payment
+from django_stars.stars_app.models import PaymentSystem
+from integrations.Merchants.credentials import MerchantCredentials
+from integrations.Merchants.webhooks import (
+    IGNORED,
+    MerchantWebhook,
+    RawWebhook,
+    Reply,
+    Verified,
+    WebhookRejected,
+)
 
 router = APIRouter()
 
+FAIL = Reply("Fail", 500)
 
-@router.post("/lolzteam", response_class=HTMLResponse)
-def lolzteam(data=Body(), secret_key=Header(alias="x-secret-key")):
-    try:
-        payment_system = PaymentSystem.objects.get(name=PaymentSystem.Names.LOLZTEAM)
-    except PaymentSystem.DoesNotExist:
-        return "fail"
-    if secret_key != payment_system.secret_key:
+
+def verify(raw: RawWebhook, credentials: MerchantCredentials) -> Verified:
+    secret_key = raw.headers.get("x-secret-key")
+    if secret_key != credentials.secret_key:
         logger.error(f"Invalid secret key in webhook: {secret_key}")
-        return HTMLResponse("Fail", 403)
+        raise WebhookRejected(Reply("Fail", 403))
+    try:
+        data = raw.json()
+    except ValueError:
+        data = None
     if not isinstance(data, dict):
-        logger.error("Webhook received with non-dict payload: {}", data)
-        return HTMLResponse("Fail", 500)
-
+        logger.error("Webhook received with non-dict payload: {}", raw.body)
+        raise WebhookRejected(FAIL)
     if data.get("status") != "paid":
         logger.info("Payment not completed yet or failed: {}", data)
-        return "ok"
+        return IGNORED
+    return Verified(data.get("payment_id"))
+
 
-    payment = Payment.objects.filter(id=data.get("payment_id")).first()
-    if not payment:
-        return HTMLResponse("Fail", 500)
+webhook = MerchantWebhook(
+    provider=PaymentSystem.Names.LOLZTEAM,
+    verify=verify,
+    ok=Reply("ok"),
+    not_confirmed=FAIL,
+    no_credentials=Reply("fail"),
+)
 
-    if payment.status != payment.Status.CREATED:
-        return HTMLResponse("Fail", 500)
 
-    payment.status = payment.Status.CONFIRMED
-    payment.save(update_fields=("status",))
-    return "ok"
+@router.post("/lolzteam", response_class=HTMLResponse)
+async def lolzteam(request: Request):
+    return await webhook.handle(request)
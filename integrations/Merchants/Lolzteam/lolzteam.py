@@ -4,6 +4,7 @@ import requests
 from loguru import logger
 
 from fastapi_stars.settings import settings
+from integrations.utils.metrics import timed
 from ..models import BillSchema
 
 
@@ -19,6 +20,7 @@ class LolzTeam:
         self.__merchant_id = merchant_id
         self.__token = token
 
+    @timed("merchant", "lolzteam")
     def create_bill(self, order_id: str, amount: float, return_url: str) -> BillSchema:
         amount += amount * 0.05
 
@@ -0,0 +1,61 @@
+import hashlib
+from dataclasses import dataclass
+
+from django_stars.stars_app.models import PaymentSystem
+from integrations.utils.invalidation import ReloadableCache
+
+
+@dataclass(frozen=True, slots=True)
+class MerchantCredentials:
+    """Ключи платёжной системы с заранее вычисленными секретами подписи."""
+
+    id: int
+    name: str
+    is_active: bool
+    shop_id: str | None
+    access_key: str | None
+    secret_key: str | None
+    # CryptoPay подписывает вебхуки HMAC-SHA256 с ключом sha256(access_key)
+    hmac_secret: bytes | None
+    # FreeKassa хранит в secret_key пару "секрет1,секрет2"
+    secret_parts: tuple[str, ...]
+
+
+def _build(system: PaymentSystem) -> MerchantCredentials:
+    return MerchantCredentials(
+        id=system.id,
+        name=system.name,
+        is_active=system.is_active,
+        shop_id=system.shop_id,
+        access_key=system.access_key,
+        secret_key=system.secret_key,
+        hmac_secret=(
+            hashlib.sha256(system.access_key.encode()).digest()
+            if system.access_key
+            else None
+        ),
+        secret_parts=tuple(system.secret_key.split(",")) if system.secret_key else (),
+    )
+
+
+def _load() -> dict[str | int, MerchantCredentials]:
+    # Неактивные системы тоже загружаются: вебхуки по уже выставленным
+    # счетам должны проходить и после отключения системы в админке.
+    registry = {}
+    for system in PaymentSystem.objects.all():
+        credentials = _build(system)
+        registry[credentials.name] = credentials
+        registry[credentials.id] = credentials
+    return registry
+
+
+_registry = ReloadableCache(_load, depends_on=(PaymentSystem._meta.label_lower,))
+
+
+def get_credentials(name_or_id: str | int) -> MerchantCredentials | None:
+    """Ключи платёжной системы по имени (`PaymentSystem.Names`) или id."""
+    return _registry.get().get(name_or_id)
+
+
+async def aget_credentials(name_or_id: str | int) -> MerchantCredentials | None:
+    return (await _registry.aget()).get(name_or_id)
@@ -0,0 +1,79 @@
+import json
+import os
+import socket
+
+from redis import ResponseError
+
+from integrations.utils.cache import (
+    cache_key,
+    get_async_redis,
+    raw_redis_client as r,
+)
+
+STREAM = cache_key("merchant_webhooks")
+# Записи, которые так и не удалось применить (см. `dead_letter_exhausted`)
+DEAD_STREAM = cache_key("merchant_webhooks", "dead")
+GROUP = "appliers"
+# Примерный предел длины стрима: старые (уже применённые) записи вытесняются
+MAX_LEN = 100_000
+
+
+def consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+async def enqueue(provider: str, body: bytes, headers: dict[str, str]) -> str:
+    """Сохраняет уведомление в стрим; это единственная работа в запросе."""
+    # Тело храним как есть (bytes): подписи считаются по сырым байтам
+    entry_id = await get_async_redis(raw=True).xadd(
+        STREAM,
+        {"provider": provider, "body": body, "headers": json.dumps(headers)},
+        maxlen=MAX_LEN,
+        approximate=True,
+    )
+    return entry_id.decode()
+
+
+def decode_entry(fields: dict[bytes, bytes]) -> tuple[str, bytes, dict[str, str]]:
+    """:return: (provider, body, headers)"""
+    return (
+        fields[b"provider"].decode(),
+        fields[b"body"],
+        json.loads(fields[b"headers"]),
+    )
+
+
+def dead_letter_exhausted(max_deliveries: int, min_idle_ms: int, count: int) -> int:
+    """
+    Переносит в `DEAD_STREAM` зависшие записи, выданные `max_deliveries` раз.
+
+    Такие записи подтверждаются (XACK) в основном стриме и больше не
+    забираются повторно; разобрать их можно `replay_webhooks --dead`.
+
+    :return: Сколько записей перенесено
+    """
+    moved = 0
+    for item in r.xpending_range(
+        STREAM, GROUP, min="-", max="+", count=count, idle=min_idle_ms
+    ):
+        if item["times_delivered"] < max_deliveries:
+            continue
+        entry_id = item["message_id"]
+        for _, fields in r.xrange(STREAM, entry_id, entry_id):
+            r.xadd(
+                DEAD_STREAM,
+                {**fields, b"origin_id": entry_id},
+                maxlen=MAX_LEN,
+                approximate=True,
+            )
+        r.xack(STREAM, GROUP, entry_id)
+        moved += 1
+    return moved
+
+
+def ensure_group() -> None:
+    try:
+        r.xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
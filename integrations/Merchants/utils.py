@@ -1,19 +1,35 @@
-from django_stars.stars_app.models import Order
+from django_stars.stars_app.models import Order, Payment, PaymentSystem
 from fastapi_stars.settings import settings
-from integrations.Currencies import USDT
+from fastapi_stars.utils.quotes import get_price_table
 from integrations.Merchants.Cardlink import CardLink
 from integrations.Merchants.CryptoPay import CryptoPay
 from integrations.Merchants.FreeKassa import FreeKassa
 from integrations.Merchants.Heleket import Heleket
 from integrations.Merchants.Lolzteam import LolzTeam
+from integrations.Merchants.credentials import get_credentials
 
 
-def generate_pay_link(order: Order, user_ip: str):
-    payment = order.payment.first()
+def generate_pay_link(order: Order, user_ip: str, payment: Payment | None = None):
+    """
+    Создаёт счёт у мерчанта и возвращает ссылку на оплату.
+
+    :param order: Заказ.
+    :param user_ip: IP покупателя (нужен FreeKassa).
+    :param payment: Платёж заказа с уже загруженным `method`; если не передан —
+        берётся первый платёж заказа.
+    :return: Ссылка на оплату или None.
+    """
+    if payment is None:
+        payment = order.payment.select_related("method").first()
+    if not payment or not payment.method:
+        return None
+    system = get_credentials(payment.method.system_id)
+    if not system:
+        return None
     link = None
-    match payment.method.system.name:
-        case payment.method.system.Names.CRYPTOPAY:
-            cryptopay = CryptoPay(payment.method.system.access_key)
+    match system.name:
+        case PaymentSystem.Names.CRYPTOPAY:
+            cryptopay = CryptoPay(system.access_key)
             link = cryptopay.create_bill(
                 payment.id,
                 "USD",
@@ -21,25 +37,21 @@ def generate_pay_link(order: Order, user_ip: str):
                 f"Pay for HelperStars #{order.id}",
                 settings.pay_success_url,
             )
-        case payment.method.system.Names.CARDLINK:
-            cardlink = CardLink(
-                payment.method.system.shop_id, payment.method.system.access_key
-            )
-            amount = USDT.usd_to_rub(order.price)
+        case PaymentSystem.Names.CARDLINK:
+            cardlink = CardLink(system.shop_id, system.access_key)
+            amount = get_price_table().usd_to_rub(order.price)
             link = cardlink.create_bill(payment.id, amount)
-        case payment.method.system.Names.HELEKET:
-            heleket = Heleket(
-                payment.method.system.shop_id, payment.method.system.access_key
-            )
+        case PaymentSystem.Names.HELEKET:
+            heleket = Heleket(system.shop_id, system.access_key)
             link = heleket.create_bill(
                 payment.id, order.price, settings.pay_success_url
             )
-        case payment.method.system.Names.FREEKASSA:
-            amount = USDT.usd_to_rub(order.price)
+        case PaymentSystem.Names.FREEKASSA:
+            amount = get_price_table().usd_to_rub(order.price)
             freekassa = FreeKassa(
-                payment.method.system.shop_id,
-                payment.method.system.secret_key.split(",")[0],
-                payment.method.system.access_key,
+                system.shop_id,
+                system.secret_parts[0],
+                system.access_key,
             )
             if payment.method.code:
                 link = freekassa.create_bill(
@@ -51,12 +63,12 @@ def generate_pay_link(order: Order, user_ip: str):
                 )
             else:
                 link = freekassa.create_sci(payment.id, amount)
-        case payment.method.system.Names.LOLZTEAM:
+        case PaymentSystem.Names.LOLZTEAM:
             lolzteam = LolzTeam(
-                payment.method.system.shop_id,
-                payment.method.system.access_key,
+                system.shop_id,
+                system.access_key,
             )
-            amount = USDT.usd_to_rub(order.price)
+            amount = get_price_table().usd_to_rub(order.price)
             link = lolzteam.create_bill(payment.id, amount, settings.pay_success_url)
     if link and link.status:
         payment.payment_id = link.id
@@ -0,0 +1,122 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, NamedTuple
+from urllib.parse import parse_qsl
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse
+
+from fastapi_stars.settings import settings
+from integrations.Merchants import queue
+from integrations.Merchants.credentials import (
+    MerchantCredentials,
+    aget_credentials,
+    get_credentials,
+)
+from integrations.payments import aconfirm_payment, confirm_payment
+
+
+class Reply(NamedTuple):
+    """Ответ платёжной системе на уведомление."""
+
+    body: str
+    status_code: int = 200
+
+    def response(self) -> HTMLResponse:
+        return HTMLResponse(self.body, self.status_code)
+
+
+@dataclass(frozen=True, slots=True)
+class RawWebhook:
+    """Уведомление в том виде, в каком его прислала платёжная система."""
+
+    body: bytes
+    headers: dict[str, str]
+
+    def form(self) -> dict[str, str]:
+        return dict(parse_qsl(self.body.decode(), keep_blank_values=True))
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+@dataclass(frozen=True, slots=True)
+class Verified:
+    """
+    Результат успешной проверки подписи.
+
+    `ignored=True` — уведомление принято, но платёж подтверждать не нужно
+    (например, счёт ещё не оплачен).
+    """
+
+    payment_id: str | None
+    provider_ref: str | None = None
+    ignored: bool = False
+
+
+IGNORED = Verified(payment_id=None, ignored=True)
+
+
+class WebhookRejected(Exception):
+    """Уведомление отклонено проверкой; `reply` уходит платёжной системе."""
+
+    def __init__(self, reply: Reply):
+        super().__init__(reply.body)
+        self.reply = reply
+
+
+type Verifier = Callable[[RawWebhook, MerchantCredentials], Verified]
+
+
+@dataclass(frozen=True, slots=True)
+class MerchantWebhook:
+    """
+    Общий конвейер обработки вебхука мерчанта.
+
+    Ключи → проверка подписи (`verify`, чистый CPU) → `confirm_payment`.
+    Ответы задаются для каждого мерчанта отдельно, как того ждёт его API.
+    """
+
+    provider: str
+    verify: Verifier
+    ok: Reply
+    not_confirmed: Reply
+    no_credentials: Reply
+
+    def process(self, raw: RawWebhook) -> Reply:
+        credentials = get_credentials(self.provider)
+        if not credentials:
+            return self.no_credentials
+        try:
+            verified = self.verify(raw, credentials)
+        except WebhookRejected as e:
+            return e.reply
+        if verified.ignored:
+            return self.ok
+        if confirm_payment(verified.payment_id, self.provider, verified.provider_ref):
+            return self.ok
+        return self.not_confirmed
+
+    async def aprocess(self, raw: RawWebhook) -> Reply:
+        credentials = await aget_credentials(self.provider)
+        if not credentials:
+            return self.no_credentials
+        try:
+            verified = self.verify(raw, credentials)
+        except WebhookRejected as e:
+            return e.reply
+        if verified.ignored:
+            return self.ok
+        if await aconfirm_payment(
+            verified.payment_id, self.provider, verified.provider_ref
+        ):
+            return self.ok
+        return self.not_confirmed
+
+    async def handle(self, request: Request) -> HTMLResponse:
+        raw = RawWebhook(body=await request.body(), headers=dict(request.headers))
+        if settings.merchant_webhooks_queue:
+            # Отвечаем сразу, проверка и применение — в merchant_webhooks_worker
+            await queue.enqueue(self.provider, raw.body, raw.headers)
+            return self.ok.response()
+        return (await self.aprocess(raw)).response()
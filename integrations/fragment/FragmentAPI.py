@@ -18,6 +18,7 @@ from .types import (
     StarsPrice,
     StarsRecipient,
 )
+from ..utils.metrics import timed
 from ..utils.singleton import Singleton
 from ..wallet import Wallet
 
@@ -250,7 +251,9 @@ class FragmentAPI(metaclass=Singleton):
             self._get_session_hash()
 
         endpoint = f"{self.ENDPOINT}/api?hash={self._session_hash}"
-        response = self._client.post(endpoint, **kwargs)
+        operation = kwargs.get("data", {}).get("method", "")
+        with timed("fragment", operation):
+            response = self._client.post(endpoint, **kwargs)
 
         data = response.json()
         if isinstance(data, dict) and data.get("error") in (
@@ -279,7 +282,8 @@ class FragmentAPI(metaclass=Singleton):
         self._save_cookies()
 
     def _get_session_hash(self):
-        resp = self._client.get(url=self.ENDPOINT)
+        with timed("fragment", "session_hash"):
+            resp = self._client.get(url=self.ENDPOINT)
         session_hash = re.findall(r'apiUrl":"\\/api\?hash=(.+?)"', resp.text)[0]
         self._session_hash = session_hash
 
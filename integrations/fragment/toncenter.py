@@ -5,6 +5,8 @@ import json
 import requests
 from loguru import logger
 
+from integrations.utils.metrics import timed
+
 
 def is_b64(addr: str) -> bool:
     try:
@@ -91,7 +93,8 @@ class TonCenter:
             "msg_hash": msg_hash,
             "limit": 1,
         }
-        response = self.client.get(url, params=params)
+        with timed("toncenter", "traces"):
+            response = self.client.get(url, params=params)
         try:
             response = response.json()
         except json.JSONDecodeError:
@@ -0,0 +1,3 @@
+from .confirmation import aconfirm_payment, confirm_payment, wait_confirmed
+
+__all__ = ["aconfirm_payment", "confirm_payment", "wait_confirmed"]
@@ -0,0 +1,153 @@
+"""
+Подтверждение платежей по уведомлениям платёжных систем.
+
+Подтверждение публикуется в стрим `CONFIRMED_STREAM` — событие исполнения
+заказа. Воркеры исполнения (`send_transaction_worker`, `gifts_worker`) ждут
+его через `wait_confirmed` вместо фиксированной паузы и сразу выбирают
+оплаченные заказы. Источник истины — БД: потерянное событие лишь откладывает
+заказ до следующего цикла воркера.
+"""
+
+import time
+
+from django.db import connection, transaction
+from loguru import logger
+from redis import RedisError
+
+from django_stars.stars_app.models import Payment, PaymentWebhook
+from integrations.utils.cache import cache_key, get_async_redis, redis_client
+
+CONFIRMED_STREAM = cache_key("payments", "confirmed")
+# Примерный предел длины стрима: события нужны только для пробуждения
+CONFIRMED_MAX_LEN = 10_000
+
+
+def _pending(payment_id: str):
+    return Payment.objects.filter(id=payment_id, status=Payment.Status.CREATED)
+
+
+def _log_kwargs(transitioned: bool) -> dict:
+    # Строка лога одна на платёж. Подтвердить платёж может лишь один вызов,
+    # и его отметка перезаписывает строку раннего уведомления; остальные
+    # уведомления её не трогают.
+    if not transitioned:
+        return {"ignore_conflicts": True}
+    unique_fields = (
+        ["provider", "payment_id"]
+        if connection.features.supports_update_conflicts_with_target
+        else None
+    )
+    return {
+        "update_conflicts": True,
+        "unique_fields": unique_fields,
+        "update_fields": ["provider_ref", "transitioned"],
+    }
+
+
+def _log_entry(
+    payment_id: str, provider: str, provider_ref: str | None, transitioned: bool
+) -> list[PaymentWebhook]:
+    return [
+        PaymentWebhook(
+            provider=provider,
+            payment_id=payment_id,
+            provider_ref=provider_ref,
+            transitioned=transitioned,
+        )
+    ]
+
+
+def _publish_confirmed(payment_id: str) -> None:
+    try:
+        redis_client.xadd(
+            CONFIRMED_STREAM,
+            {"payment_id": payment_id},
+            maxlen=CONFIRMED_MAX_LEN,
+            approximate=True,
+        )
+    except RedisError:
+        logger.exception(f"Payment {payment_id}: confirmation event not published")
+
+
+async def _apublish_confirmed(payment_id: str) -> None:
+    try:
+        await get_async_redis().xadd(
+            CONFIRMED_STREAM,
+            {"payment_id": payment_id},
+            maxlen=CONFIRMED_MAX_LEN,
+            approximate=True,
+        )
+    except RedisError:
+        logger.exception(f"Payment {payment_id}: confirmation event not published")
+
+
+def confirm_payment(
+    payment_id: str | None, provider: str, provider_ref: str | None = None
+) -> bool:
+    """
+    Идемпотентно подтверждает платёж по уведомлению платёжной системы.
+
+    Переход CREATED → CONFIRMED выполняется одним условным UPDATE, поэтому
+    повторные и параллельные вебхуки не подтвердят платёж дважды. После
+    коммита публикуется событие исполнения (`CONFIRMED_STREAM`).
+
+    :param payment_id: ID нашего платежа из уведомления.
+    :param provider: Имя платёжной системы (`PaymentSystem.Names`).
+    :param provider_ref: Идентификатор счёта/транзакции у платёжной системы.
+    :return: True, если именно этот вызов подтвердил платёж.
+    """
+    if not payment_id:
+        return False
+    transitioned = bool(_pending(payment_id).update(status=Payment.Status.CONFIRMED))
+    PaymentWebhook.objects.bulk_create(
+        _log_entry(payment_id, provider, provider_ref, transitioned),
+        **_log_kwargs(transitioned),
+    )
+    if transitioned:
+        logger.info(f"Payment {payment_id} confirmed by {provider}")
+        # Внутри транзакции воркер не должен проснуться раньше коммита
+        transaction.on_commit(lambda: _publish_confirmed(payment_id))
+    return transitioned
+
+
+async def aconfirm_payment(
+    payment_id: str | None, provider: str, provider_ref: str | None = None
+) -> bool:
+    """Async-версия `confirm_payment` на async ORM Django."""
+    if not payment_id:
+        return False
+    transitioned = bool(
+        await _pending(payment_id).aupdate(status=Payment.Status.CONFIRMED)
+    )
+    await PaymentWebhook.objects.abulk_create(
+        _log_entry(payment_id, provider, provider_ref, transitioned),
+        **_log_kwargs(transitioned),
+    )
+    if transitioned:
+        logger.info(f"Payment {payment_id} confirmed by {provider}")
+        await _apublish_confirmed(payment_id)
+    return transitioned
+
+
+def wait_confirmed(last_id: str | None, block_ms: int) -> str:
+    """
+    Ждёт подтверждений платежей после события `last_id`, но не дольше `block_ms`.
+
+    Заменяет паузу между циклами воркера исполнения. `block_ms` должен быть
+    меньше `redis_socket_timeout`. При недоступности Redis просто спит.
+
+    :param last_id: Результат прошлого вызова; None — при первом вызове
+    :return: ID последнего увиденного события для следующего вызова
+    """
+    try:
+        if last_id is None:
+            latest = redis_client.xrevrange(CONFIRMED_STREAM, count=1)
+            last_id = latest[0][0] if latest else "0-0"
+        for _stream, entries in redis_client.xread(
+            {CONFIRMED_STREAM: last_id}, count=100, block=block_ms
+        ):
+            last_id = entries[-1][0]
+    except RedisError:
+        logger.exception("Error while waiting for payment confirmations")
+        time.sleep(block_ms / 1000)
+    return last_id
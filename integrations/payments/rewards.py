@@ -0,0 +1,103 @@
+"""
+Начисление реферальных вознаграждений по завершённым заказам.
+
+Начисление привязано к заказу флагом `Order.referrals_rewarded`: его выставляет
+условный UPDATE в начале транзакции, поэтому повторный вызов (сигнал, воркер,
+бэкфилл) по тому же заказу ничего не начислит.
+
+Пока проценты (`REFERRAL_PERCENTS`) не заданы, начисление выключено: заказы
+не помечаются обработанными и будут начислены, когда проценты появятся.
+"""
+
+from django.db import transaction
+from django.db.models import F
+from loguru import logger
+
+from django_stars.stars_app.models import Order, Referral, User
+from django_stars.stars_app.referrals import add_profits, increments
+from fastapi_stars.settings import settings
+
+
+def _claim(order_id: int) -> int:
+    return Order.objects.filter(
+        id=order_id,
+        status=Order.Status.COMPLETED,
+        is_refund=False,
+        user__isnull=False,
+        referrals_rewarded=False,
+    ).update(referrals_rewarded=True)
+
+
+def accrue_order_rewards(order_id: int) -> float | None:
+    """
+    Начисляет вознаграждения рефоводам 1–3 уровня покупателя заказа.
+
+    Цепочка рефоводов берётся одним запросом из `Referral` (там уже все
+    уровни), все прибавки к `Referral.profit`, `User.referral_balance` и
+    `ReferralStats` — UPDATE с `F()` в одной транзакции.
+
+    :return: Сумма начислений или None, если заказ не подходит/уже обработан
+        или начисление выключено.
+    """
+    percents = settings.referral_percents
+    if not percents:
+        return None
+    with transaction.atomic():
+        if not _claim(order_id):
+            return None
+        order = Order.objects.values("user_id", "price", "white_price").get(id=order_id)
+        margin = max(order["price"] - order["white_price"], 0)
+        chain = Referral.objects.filter(
+            referred_id=order["user_id"], level__lte=len(percents)
+        ).values_list("id", "referrer_id", "level")
+        by_referral, by_user = {}, {}
+        for referral_id, referrer_id, level in chain:
+            reward = round(margin * percents[level - 1] / 100, 6)
+            if reward > 0:
+                by_referral[referral_id] = reward
+                by_user[referrer_id] = by_user.get(referrer_id, 0) + reward
+        total = sum(by_referral.values())
+        if by_referral:
+            Referral.objects.filter(id__in=by_referral).update(
+                profit=F("profit") + increments("id", by_referral)
+            )
+            User.objects.filter(id__in=by_user).update(
+                referral_balance=F("referral_balance") + increments("id", by_user)
+            )
+            add_profits(by_user)
+        Order.objects.filter(id=order_id).update(referrals_reward=total)
+    if total:
+        logger.info(f"Order {order_id}: referral rewards {total} to {len(by_user)}")
+    return total
+
+
+def backfill_rewards(batch_size: int = 500, start_id: int = 0) -> tuple[int, float]:
+    """
+    Начисляет вознаграждения по завершённым заказам, где их ещё не было.
+
+    Заказы выбираются батчами по id; каждый заказ — своя короткая транзакция.
+
+    :return: (обработано заказов, сумма начислений)
+    """
+    processed, accrued = 0, 0.0
+    if not settings.referral_percents:
+        logger.warning("REFERRAL_PERCENTS is empty, referral rewards are disabled")
+        return processed, accrued
+    last_id = start_id
+    pending = Order.objects.filter(
+        status=Order.Status.COMPLETED,
+        is_refund=False,
+        user__isnull=False,
+        referrals_rewarded=False,
+    ).order_by("id")
+    while ids := list(
+        pending.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size]
+    ):
+        for order_id in ids:
+            total = accrue_order_rewards(order_id)
+            if total is not None:
+                processed += 1
+                accrued += total
+        last_id = ids[-1]
+        logger.info(f"Referral rewards backfilled up to order #{last_id}")
+    return processed, accrued
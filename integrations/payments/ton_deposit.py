@@ -5,8 +5,10 @@ import requests
 from loguru import logger
 from pytoniq_core import Address
 
-from django_stars.stars_app.models import TonTransaction
+from django_stars.stars_app.models import PaymentSystem, TonTransaction
 from fastapi_stars.settings import settings
+from integrations.payments.confirmation import confirm_payment
+from integrations.utils.metrics import WorkerProbe, timed
 
 
 def check_ton_deposits():
@@ -27,9 +29,12 @@ def check_ton_deposits():
         "Authorization": f"Bearer {settings.ton_api_key.get_secret_value()}",
     }
 
+    probe = WorkerProbe("check_ton_deposits")
     while main_thread().is_alive():
+        probe.beat()
         try:
-            response = requests.get(url, params=params, headers=headers)
+            with timed("tonapi", "account_events"):
+                response = requests.get(url, params=params, headers=headers)
         except requests.exceptions.RequestException:
             logger.exception("Error fetching transactions")
             time.sleep(3)
@@ -86,14 +91,17 @@ def check_ton_deposits():
                         ton_transaction.hash = transaction_hash
                         ton_transaction.source = sender_address
                         ton_transaction.save(update_fields=("hash", "source"))
-                        ton_transaction.payment.status = (
-                            ton_transaction.payment.Status.CONFIRMED
+                        confirm_payment(
+                            ton_transaction.payment_id,
+                            PaymentSystem.Names.TON_CONNECT,
+                            transaction_hash,
                         )
-                        ton_transaction.payment.save(update_fields=("status",))
+                        probe.processed()
                 except Exception:
                     logger.exception(
                         f"Error processing transaction {event.get('event_id', '')}"
                     )
         else:
             print(f"Failed to fetch transactions. Status code: {response.status_code}")
+        probe.done()
         time.sleep(3)
@@ -0,0 +1,111 @@
+"""
+Общий клиент Redis для API, воркеров и интеграций.
+
+Все модули берут соединения из одного пула на процесс, поэтому размер пула,
+таймауты и адрес Redis настраиваются (и наблюдаются) в одном месте.
+
+    from integrations.utils.cache import redis_client, cache_key
+
+    redis_client.get(cache_key("base_prices"))
+"""
+
+import os
+import threading
+
+import redis.asyncio
+from redis import BlockingConnectionPool, Redis
+from redis.connection import UnixDomainSocketConnection
+
+from fastapi_stars.settings import settings
+from integrations.utils.metrics import timed
+
+
+def _pool_kwargs(decode_responses: bool) -> dict:
+    kwargs = dict(
+        db=settings.redis_db,
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_connect_timeout,
+        health_check_interval=30,
+        decode_responses=decode_responses,
+    )
+    if settings.redis_unix_socket:
+        kwargs["path"] = settings.redis_unix_socket
+    else:
+        kwargs["host"] = settings.redis_host
+        kwargs["port"] = settings.redis_port
+    return kwargs
+
+
+def _sync_pool(decode_responses: bool) -> BlockingConnectionPool:
+    kwargs = _pool_kwargs(decode_responses)
+    if "path" in kwargs:
+        kwargs["connection_class"] = UnixDomainSocketConnection
+    # Пул сам пересоздаёт соединения после fork (gunicorn `--preload`)
+    return BlockingConnectionPool(**kwargs)
+
+
+def _async_pool(decode_responses: bool) -> redis.asyncio.BlockingConnectionPool:
+    kwargs = _pool_kwargs(decode_responses)
+    if "path" in kwargs:
+        kwargs["connection_class"] = redis.asyncio.UnixDomainSocketConnection
+    return redis.asyncio.BlockingConnectionPool(**kwargs)
+
+
+class _TimedRedis(Redis):
+    def execute_command(self, *args, **options):
+        with timed("redis", args[0]):
+            return super().execute_command(*args, **options)
+
+
+class _TimedAsyncRedis(redis.asyncio.Redis):
+    async def execute_command(self, *args, **options):
+        with timed("redis", args[0]):
+            return await super().execute_command(*args, **options)
+
+
+pool = _sync_pool(decode_responses=True)
+# Для данных, где важны сырые байты (тела вебхуков и т.п.)
+raw_pool = _sync_pool(decode_responses=False)
+
+redis_client = _TimedRedis(connection_pool=pool)
+raw_redis_client = _TimedRedis(connection_pool=raw_pool)
+
+_async_clients: dict[tuple[int, bool], redis.asyncio.Redis] = {}
+_async_lock = threading.Lock()
+
+
+def get_async_redis(raw: bool = False) -> redis.asyncio.Redis:
+    """
+    Async-клиент на общих настройках.
+
+    Создаётся лениво, один на процесс: соединения asyncio-пула нельзя
+    переносить через fork.
+    """
+    key = (os.getpid(), raw)
+    client = _async_clients.get(key)
+    if client is None:
+        with _async_lock:
+            client = _async_clients.get(key)
+            if client is None:
+                client = _TimedAsyncRedis(
+                    connection_pool=_async_pool(decode_responses=not raw)
+                )
+                _async_clients[key] = client
+    return client
+
+
+def cache_key(*parts: object) -> str:
+    """`cache_key("price", "stars", 50)` → `stars_site:price:stars:50`."""
+    return ":".join((settings.redis_key_prefix, *map(str, parts)))
+
+
+__all__ = [
+    "pool",
+    "raw_pool",
+    "redis_client",
+    "raw_redis_client",
+    "get_async_redis",
+    "cache_key",
+]
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Generic, Iterable, TypeVar
+
+from asgiref.sync import sync_to_async
+from loguru import logger
+from redis import RedisError
+
+from integrations.utils.cache import cache_key, redis_client as r
+from integrations.utils.singleton import Singleton
+
+T = TypeVar("T")
+
+CHANNEL = cache_key("invalidate")
+
+
+def publish_invalidation(name: str) -> None:
+    """
+    Сообщает всем процессам, что данные `name` (обычно `app_label.model`) изменились.
+
+    Ошибки Redis только логируются: сохранение в админке не должно падать из-за кэша.
+    """
+    try:
+        r.publish(CHANNEL, name)
+    except RedisError:
+        logger.exception(f"Failed to publish invalidation for {name}")
+
+
+class InvalidationListener(metaclass=Singleton):
+    """
+    Фоновый подписчик на канал инвалидации.
+
+    Поток запускается лениво и перезапускается после fork (gunicorn `--preload`),
+    поэтому подписываться можно из любого процесса.
+    """
+
+    RECONNECT_SLEEP = 1
+    # Меньше redis_socket_timeout: ожидание сообщения не должно обрывать соединение
+    POLL_TIMEOUT = 1
+
+    def __init__(self) -> None:
+        self._callbacks: dict[str, list[Callable[[], None]]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+
+    def subscribe(self, names: Iterable[str], callback: Callable[[], None]) -> None:
+        with self._lock:
+            for name in names:
+                if callback not in self._callbacks[name]:
+                    self._callbacks[name].append(callback)
+        self.ensure_started()
+
+    def ensure_started(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(
+                target=self._run, name="invalidation-listener", daemon=True
+            ).start()
+
+    def _notify(self, names: Iterable[str]) -> None:
+        callbacks = []
+        with self._lock:
+            for name in names:
+                callbacks.extend(self._callbacks.get(name, ()))
+        for callback in set(callbacks):
+            try:
+                callback()
+            except Exception:
+                logger.exception("Invalidation callback failed")
+
+    def _run(self) -> None:
+        while True:
+            try:
+                pubsub = r.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                while True:
+                    # get_message, а не listen(): между сообщениями идут
+                    # health check, и простой канала не даёт TimeoutError
+                    message = pubsub.get_message(timeout=self.POLL_TIMEOUT)
+                    if message is not None:
+                        self._notify((message["data"],))
+            except RedisError:
+                logger.exception("Invalidation listener disconnected")
+            # Пока соединения не было, сообщения могли потеряться — сбрасываем всё.
+            self._notify(tuple(self._callbacks))
+            time.sleep(self.RECONNECT_SLEEP)
+
+
+class ReloadableCache(Generic[T]):
+    """
+    Процессный кэш данных из БД с версией.
+
+    Загружается при первом обращении, сбрасывается сообщением из канала
+    инвалидации для любого из `depends_on` и, на всякий случай, по `ttl`.
+    """
+
+    def __init__(
+        self, loader: Callable[[], T], depends_on: Iterable[str], ttl: float = 300
+    ) -> None:
+        self._loader = loader
+        self._depends_on = tuple(depends_on)
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._data: T | None = None
+        self._loaded_at = 0.0
+        self._stale = True
+        self._subscribed_pid: int | None = None
+        self.version = 0
+
+    @property
+    def is_fresh(self) -> bool:
+        return not self._stale and time.monotonic() - self._loaded_at < self._ttl
+
+    def get(self) -> T:
+        if self._subscribed_pid != os.getpid():
+            InvalidationListener().subscribe(self._depends_on, self.invalidate)
+            self._subscribed_pid = os.getpid()
+        if self.is_fresh:
+            return self._data
+        with self._lock:
+            if not self.is_fresh:
+                # Сбрасываем флаг до загрузки: инвалидация во время загрузки
+                # не должна потеряться.
+                self._stale = False
+                try:
+                    self._data = self._loader()
+                except Exception:
+                    self._stale = True
+                    raise
+                self._loaded_at = time.monotonic()
+                self.version += 1
+            return self._data
+
+    async def aget(self) -> T:
+        """`get()` для async-кода: загрузка из БД уходит в поток."""
+        if self.is_fresh and self._subscribed_pid == os.getpid():
+            return self._data
+        return await sync_to_async(self.get)()
+
+    def invalidate(self) -> None:
+        self._stale = True
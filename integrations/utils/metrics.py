@@ -0,0 +1,227 @@
+"""
+Метрики Prometheus для API и воркеров.
+
+Внешние вызовы (Fragment, TonCenter/tonapi, мерчанты, Redis, БД) оборачиваются
+в `timed()`: длительность пишется в гистограмму по сервису и, если вызов идёт
+внутри HTTP-запроса, добавляется к разбивке запроса (`request_breakdown()`).
+Разбивку открывает `MetricsMiddleware`; ContextVar копируется в threadpool и
+`sync_to_async`, поэтому sync-код эндпоинтов тоже в неё попадает.
+
+    with timed("fragment", "api"):
+        response = client.post(...)
+
+Циклы фоновых воркеров (run_threads.py) отмечаются через `WorkerProbe`.
+
+Под gunicorn метрики воркеров собираются через multiprocess-режим
+prometheus_client (`PROMETHEUS_MULTIPROC_DIR`, см. start_backend.sh).
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.registry import REGISTRY
+
+# Внешние API отвечают за сотни миллисекунд, Redis и БД — за единицы
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_LATENCY = Histogram(
+    "stars_http_request_duration_seconds",
+    "Длительность HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=BUCKETS,
+)
+REQUEST_UPSTREAM = Histogram(
+    "stars_http_request_upstream_seconds",
+    "Суммарное время внешних вызовов за один HTTP-запрос, по сервисам",
+    ["route", "service"],
+    buckets=BUCKETS,
+)
+UPSTREAM_LATENCY = Histogram(
+    "stars_upstream_duration_seconds",
+    "Длительность одного внешнего вызова",
+    ["service", "operation"],
+    buckets=BUCKETS,
+)
+UPSTREAM_ERRORS = Counter(
+    "stars_upstream_errors_total",
+    "Внешние вызовы, завершившиеся исключением",
+    ["service", "operation"],
+)
+
+WORKER_CYCLE = Histogram(
+    "stars_worker_cycle_seconds",
+    "Длительность одного цикла воркера (без паузы между циклами)",
+    ["worker"],
+    buckets=BUCKETS,
+)
+WORKER_ITEMS = Counter(
+    "stars_worker_items_total",
+    "Обработанные воркером элементы (заказы, события, задачи)",
+    ["worker"],
+)
+WORKER_ERRORS = Counter(
+    "stars_worker_errors_total",
+    "Ошибки, залогированные в потоке воркера",
+    ["worker"],
+)
+WORKER_HEARTBEAT = Gauge(
+    "stars_worker_heartbeat_timestamp_seconds",
+    "Время начала последнего цикла воркера (unix)",
+    ["worker"],
+    multiprocess_mode="max",
+)
+WORKER_RESTARTS = Counter(
+    "stars_worker_restarts_total",
+    "Перезапуски упавших потоков воркеров",
+    ["worker"],
+)
+ORDERS_QUEUED = Gauge(
+    "stars_orders_queued",
+    "Заказы, ожидающие исполнения, по статусу",
+    ["status"],
+    multiprocess_mode="max",
+)
+ORDERS_OLDEST_AGE = Gauge(
+    "stars_orders_oldest_age_seconds",
+    "Возраст самого старого ожидающего заказа по статусу",
+    ["status"],
+    multiprocess_mode="max",
+)
+
+# {сервис: секунды} текущего HTTP-запроса; None вне запроса
+_breakdown: ContextVar[dict[str, float] | None] = ContextVar(
+    "request_breakdown", default=None
+)
+
+
+@contextmanager
+def request_breakdown():
+    """Открывает разбивку времени запроса по внешним сервисам."""
+    breakdown = {}
+    token = _breakdown.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        _breakdown.reset(token)
+
+
+@contextmanager
+def timed(service: str, operation: str = ""):
+    """
+    Замеряет внешний вызов. Работает и как декоратор sync-функций.
+
+    :param service: Сервис (`fragment`, `redis`, `db`, ...)
+    :param operation: Операция с ограниченным набором значений (не id/URL)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        UPSTREAM_ERRORS.labels(service, operation).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        UPSTREAM_LATENCY.labels(service, operation).observe(elapsed)
+        breakdown = _breakdown.get()
+        if breakdown is not None:
+            breakdown[service] = breakdown.get(service, 0.0) + elapsed
+
+
+class WorkerProbe:
+    """
+    Метрики цикла воркера.
+
+        probe = WorkerProbe("gifts_worker")
+        while ...:
+            probe.beat()
+            ...
+            probe.done(len(orders))
+            time.sleep(5)
+
+    Цикл, прерванный `continue` до `done()`, в гистограмму не попадает, но
+    heartbeat обновляется. Имя совпадает с именем потока у супервизора.
+    """
+
+    # {воркер: unix-время последнего heartbeat} — для проверки зависаний
+    beats: dict[str, float] = {}
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._cycle = WORKER_CYCLE.labels(name)
+        self._items = WORKER_ITEMS.labels(name)
+        self._heartbeat = WORKER_HEARTBEAT.labels(name)
+        self._started: float | None = None
+
+    def beat(self) -> None:
+        """Начало цикла."""
+        now = time.time()
+        self.beats[self.name] = now
+        self._heartbeat.set(now)
+        self._started = time.perf_counter()
+
+    def processed(self, count: int = 1) -> None:
+        if count:
+            self._items.inc(count)
+
+    def done(self, count: int = 0) -> None:
+        """Конец цикла: длительность и число обработанных элементов."""
+        self.processed(count)
+        if self._started is not None:
+            self._cycle.observe(time.perf_counter() - self._started)
+            self._started = None
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    operation = sql.lstrip().split(" ", 1)[0].upper() if sql else ""
+    with timed("db", operation):
+        return execute(sql, params, many, context)
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+# Соединения Django создаются лениво в каждом потоке — вешаемся на каждое
+connection_created.connect(_instrument_connection, dispatch_uid="stars_metrics_db")
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Текст для /metrics: сводка по всем процессам gunicorn или по текущему."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+__all__ = [
+    "REQUEST_LATENCY",
+    "REQUEST_UPSTREAM",
+    "UPSTREAM_LATENCY",
+    "UPSTREAM_ERRORS",
+    "WORKER_CYCLE",
+    "WORKER_ITEMS",
+    "WORKER_ERRORS",
+    "WORKER_HEARTBEAT",
+    "WORKER_RESTARTS",
+    "ORDERS_QUEUED",
+    "ORDERS_OLDEST_AGE",
+    "WorkerProbe",
+    "request_breakdown",
+    "timed",
+    "render_metrics",
+]
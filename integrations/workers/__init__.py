@@ -1,8 +1,12 @@
 from .gifts import gifts_worker
+from .guest_claims import guest_claims_worker
+from .guest_cleanup import guest_cleanup_worker
+from .prices import price_table_worker
 
 # from .stars_sell import stars_refund_worker, send_usdt_worker
 from .worker import check_transaction_worker
 from .worker import send_transaction_worker
+from .webhooks import merchant_webhooks_worker
 
 __all__ = [
     "check_transaction_worker",
@@ -10,5 +14,9 @@ __all__ = [
     # "stars_refund_worker",
     # "send_usdt_worker",
     "gifts_worker",
+    "merchant_webhooks_worker",
+    "price_table_worker",
+    "guest_claims_worker",
+    "guest_cleanup_worker",
     # "check_stars_balance",
 ]
@@ -6,12 +6,20 @@ from loguru import logger
 
 from django_stars.stars_app.models import Payment, Order
 from integrations.gifts import get_gift_sender
+from integrations.payments import wait_confirmed
+from integrations.utils.metrics import WorkerProbe
+
+# Ожидание подтверждения оплаты между циклами; меньше redis_socket_timeout
+CONFIRMED_WAIT_MS = 3_000
 
 
 def gifts_worker():
     sender = get_gift_sender()
+    probe = WorkerProbe("gifts_worker")
+    last_event = None
 
     while threading.main_thread().is_alive():
+        probe.beat()
         try:
             orders = Order.objects.filter(
                 status=Order.Status.CREATED,
@@ -92,4 +100,5 @@ def gifts_worker():
             #     notify_about_success(order)
             # except Exception:
             #     logger.exception("")
-        time.sleep(5)
+        probe.done(len(orders))
+        last_event = wait_confirmed(last_event, CONFIRMED_WAIT_MS)
@@ -0,0 +1,73 @@
+"""
+Перенос гостевых заказов на пользователя после логина.
+
+Источник истины — БД: логин закрепляет сессию (`claimed_by_user`), и воркер
+раз в `SCAN_INTERVAL` секунд обходит закреплённые сессии, у которых остались
+заказы. Сообщение в `CLAIMS_QUEUE` лишь будит воркер, чтобы перенос не ждал
+обхода; потерянное сообщение ничего не ломает. Сессия, на которой перенос
+падает `MAX_ATTEMPTS` раз подряд, пропускается до перезапуска процесса.
+"""
+
+import json
+import threading
+import time
+
+from loguru import logger
+
+from fastapi_stars.utils.guests import (
+    CLAIMS_QUEUE,
+    claim_guest_orders,
+    pending_claims,
+)
+from integrations.utils.cache import redis_client as r
+from integrations.utils.metrics import WorkerProbe
+
+# Меньше redis_socket_timeout, чтобы блокирующее чтение не обрывалось по таймауту
+BLOCK_SEC = 2
+SCAN_INTERVAL = 60
+SCAN_LIMIT = 100
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 3
+
+
+def _claim(sid: str, user_id: int, failures: dict[str, int]) -> int:
+    if failures.get(sid, 0) >= MAX_ATTEMPTS:
+        return 0
+    try:
+        claimed = claim_guest_orders(sid, user_id)
+    except Exception:
+        failures[sid] = failures.get(sid, 0) + 1
+        logger.exception(
+            f"Error while claiming guest session {sid} "
+            f"(attempt {failures[sid]}/{MAX_ATTEMPTS})"
+        )
+        if failures[sid] >= MAX_ATTEMPTS:
+            logger.error(f"Guest session {sid}: giving up until restart")
+        return 0
+    failures.pop(sid, None)
+    return claimed
+
+
+def guest_claims_worker():
+    probe = WorkerProbe("guest_claims_worker")
+    # {sid: неудачные попытки подряд}
+    failures: dict[str, int] = {}
+    next_scan = 0.0
+    while threading.main_thread().is_alive():
+        probe.beat()
+        try:
+            jobs = []
+            if time.monotonic() >= next_scan:
+                given_up = [sid for sid, n in failures.items() if n >= MAX_ATTEMPTS]
+                jobs += pending_claims(SCAN_LIMIT, exclude=given_up)
+                next_scan = time.monotonic() + SCAN_INTERVAL
+            item = r.blpop(CLAIMS_QUEUE, BLOCK_SEC)
+            if item is not None:
+                job = json.loads(item[1])
+                jobs.append((job["sid"], job["user_id"]))
+            if not jobs:
+                continue
+            probe.done(sum(_claim(sid, user_id, failures) for sid, user_id in jobs))
+        except Exception:
+            logger.exception("Error while polling guest claims")
+            time.sleep(RETRY_DELAY)
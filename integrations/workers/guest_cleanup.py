@@ -0,0 +1,32 @@
+import threading
+import time
+
+from loguru import logger
+
+from fastapi_stars.utils.guests import cleanup_guest_sessions
+from integrations.utils.metrics import WorkerProbe
+
+CLEANUP_INTERVAL = 3600
+# Heartbeat чаще, чем worker_stall_seconds супервизора
+POLL_INTERVAL = 10
+RETRY_DELAY = 300
+
+
+def guest_cleanup_worker():
+    probe = WorkerProbe("guest_cleanup_worker")
+    next_run = 0.0
+    while threading.main_thread().is_alive():
+        probe.beat()
+        if time.monotonic() >= next_run:
+            try:
+                deactivated, deleted = cleanup_guest_sessions()
+                if deactivated or deleted:
+                    logger.info(
+                        f"Guest sessions: {deactivated} deactivated, {deleted} deleted"
+                    )
+                next_run = time.monotonic() + CLEANUP_INTERVAL
+                probe.done(deactivated + deleted)
+            except Exception:
+                logger.exception("Error while cleaning up guest sessions")
+                next_run = time.monotonic() + RETRY_DELAY
+        time.sleep(POLL_INTERVAL)
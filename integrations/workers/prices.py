@@ -0,0 +1,28 @@
+import threading
+import time
+
+from loguru import logger
+
+from fastapi_stars.utils.quotes import refresh_price_table, take_stale_flag
+from integrations.utils.metrics import WorkerProbe
+
+REFRESH_INTERVAL = 60
+# Как часто проверять флаг внеочередной пересборки (изменение `Price`)
+POLL_INTERVAL = 1
+RETRY_DELAY = 5
+
+
+def price_table_worker():
+    probe = WorkerProbe("price_table_worker")
+    next_refresh = 0.0
+    while threading.main_thread().is_alive():
+        probe.beat()
+        try:
+            if take_stale_flag() or time.monotonic() >= next_refresh:
+                refresh_price_table()
+                next_refresh = time.monotonic() + REFRESH_INTERVAL
+                probe.done()
+        except Exception:
+            logger.exception("Error while building price table")
+            next_refresh = time.monotonic() + RETRY_DELAY
+        time.sleep(POLL_INTERVAL)
@@ -0,0 +1,95 @@
+"""
+Запуск воркеров run_threads.py и надзор за ними.
+
+Каждый воркер — daemon-поток с именем своей функции. Супервизор раз в
+`SUPERVISE_INTERVAL` секунд перезапускает упавшие потоки, предупреждает о
+воркерах без heartbeat дольше `worker_stall_seconds` и обновляет глубину
+очереди заказов. Метрики процесса отдаются на 127.0.0.1:`worker_metrics_port`.
+"""
+
+import threading
+import time
+from typing import Callable
+
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from loguru import logger
+from prometheus_client import start_http_server
+
+from django_stars.stars_app.models import Order, Payment
+from fastapi_stars.settings import settings
+from integrations.utils.metrics import (
+    ORDERS_OLDEST_AGE,
+    ORDERS_QUEUED,
+    WORKER_ERRORS,
+    WORKER_RESTARTS,
+    WorkerProbe,
+)
+
+SUPERVISE_INTERVAL = 10
+# Статусы, в которых заказ ждёт воркеров; CREATED — только оплаченные
+QUEUE_STATUSES = (
+    Order.Status.CREATED,
+    Order.Status.IN_PROGRESS,
+    Order.Status.BLOCKCHAIN_WAITING,
+)
+
+
+def collect_queue_depth() -> None:
+    """Число ожидающих заказов и возраст самого старого по каждому статусу."""
+    rows = (
+        Order.objects.filter(
+            Q(status=Order.Status.CREATED, payment__status=Payment.Status.CONFIRMED)
+            | Q(status__in=QUEUE_STATUSES[1:])
+        )
+        .values("status")
+        .annotate(count=Count("id", distinct=True), oldest=Min("created_at"))
+    )
+    by_status = {row["status"]: row for row in rows}
+    now = timezone.now()
+    for status in QUEUE_STATUSES:
+        label = status.name.lower()
+        row = by_status.get(status)
+        ORDERS_QUEUED.labels(label).set(row["count"] if row else 0)
+        age = (now - row["oldest"]).total_seconds() if row else 0
+        ORDERS_OLDEST_AGE.labels(label).set(age)
+
+
+def _start(target: Callable) -> threading.Thread:
+    thread = threading.Thread(target=target, name=target.__name__, daemon=True)
+    thread.start()
+    return thread
+
+
+def supervise(workers: tuple[Callable, ...]) -> None:
+    """Запускает воркеры и следит за ними, пока жив процесс."""
+    names = {worker.__name__ for worker in workers}
+    # Ошибки воркеров считаются по логам их потоков, без правки каждого except
+    logger.add(
+        lambda message: WORKER_ERRORS.labels(message.record["thread"].name).inc(),
+        level="ERROR",
+        filter=lambda record: record["thread"].name in names,
+        format="{message}",
+    )
+    if settings.worker_metrics_port:
+        start_http_server(settings.worker_metrics_port, addr="127.0.0.1")
+
+    threads = {worker: _start(worker) for worker in workers}
+    while True:
+        now = time.time()
+        for worker, thread in threads.items():
+            if not thread.is_alive():
+                logger.error(f"Worker {thread.name} died, restarting")
+                WORKER_RESTARTS.labels(thread.name).inc()
+                threads[worker] = _start(worker)
+                continue
+            beat = WorkerProbe.beats.get(thread.name)
+            if beat is not None and now - beat > settings.worker_stall_seconds:
+                logger.warning(
+                    f"Worker {thread.name}: no heartbeat for {now - beat:.0f}s"
+                )
+        try:
+            collect_queue_depth()
+        except Exception:
+            logger.exception("Error while collecting order queue depth")
+        time.sleep(SUPERVISE_INTERVAL)
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from loguru import logger
+from redis import RedisError
+
+from integrations.Merchants import queue
+from integrations.Merchants.webhooks import MerchantWebhook, RawWebhook
+from integrations.utils.metrics import WorkerProbe
+
+# Запись, не подтверждённая (XACK) дольше этого времени, забирается другим
+# обработчиком — например, после падения процесса посреди применения.
+CLAIM_IDLE_MS = 60_000
+# После стольких выдач запись уходит в dead-letter стрим
+MAX_DELIVERIES = 5
+BATCH = 50
+# Меньше redis_socket_timeout, чтобы блокирующее чтение не обрывалось по таймауту
+BLOCK_MS = 2_000
+
+
+def _webhooks() -> dict[str, MerchantWebhook]:
+    from integrations.Merchants.Cardlink.fastapi import webhook as cardlink
+    from integrations.Merchants.CryptoPay.fastapi import webhook as cryptopay
+    from integrations.Merchants.FreeKassa.fastapi import webhook as freekassa
+    from integrations.Merchants.Heleket.fastapi import webhook as heleket
+    from integrations.Merchants.Lolzteam.fastapi import webhook as lolzteam
+
+    return {w.provider: w for w in (cardlink, cryptopay, freekassa, heleket, lolzteam)}
+
+
+def apply_entry(
+    webhooks: dict[str, MerchantWebhook], entry_id: bytes, fields: dict
+) -> None:
+    """Проверяет и применяет одну запись стрима, затем подтверждает её (XACK)."""
+    provider, body, headers = queue.decode_entry(fields)
+    webhook = webhooks.get(provider)
+    if webhook is None:
+        logger.error(f"Webhook {entry_id!r}: unknown provider {provider}")
+    else:
+        reply = webhook.process(RawWebhook(body=body, headers=headers))
+        if reply is not webhook.ok:
+            logger.warning(f"Webhook {entry_id!r} from {provider}: {reply.body}")
+    queue.r.xack(queue.STREAM, queue.GROUP, entry_id)
+
+
+def merchant_webhooks_worker():
+    webhooks = _webhooks()
+    consumer = queue.consumer_name()
+    probe = WorkerProbe("merchant_webhooks_worker")
+
+    while threading.main_thread().is_alive():
+        probe.beat()
+        try:
+            queue.ensure_group()
+            dead = queue.dead_letter_exhausted(MAX_DELIVERIES, CLAIM_IDLE_MS, BATCH)
+            if dead:
+                logger.error(f"{dead} merchant webhooks moved to dead letters")
+            _, claimed, *_ = queue.r.xautoclaim(
+                queue.STREAM,
+                queue.GROUP,
+                consumer,
+                min_idle_time=CLAIM_IDLE_MS,
+                count=BATCH,
+            )
+            entries = claimed
+            if not entries:
+                response = queue.r.xreadgroup(
+                    queue.GROUP,
+                    consumer,
+                    {queue.STREAM: ">"},
+                    count=BATCH,
+                    block=BLOCK_MS,
+                )
+                entries = response[0][1] if response else []
+        except RedisError:
+            logger.exception("Error while reading merchant webhooks")
+            time.sleep(3)
+            continue
+
+        for entry_id, fields in entries:
+            if fields is None:
+                # Запись вытеснена MAXLEN, пока висела неподтверждённой
+                queue.r.xack(queue.STREAM, queue.GROUP, entry_id)
+                continue
+            try:
+                apply_entry(webhooks, entry_id, fields)
+            except Exception:
+                # Без XACK запись останется в PEL и будет забрана повторно
+                logger.exception(f"Error while applying webhook {entry_id!r}")
+        probe.done(len(entries))
@@ -22,14 +22,20 @@ from integrations.fragment.toncenter import (
     IncompleteTransactionError,
     NotFoundTransactionError,
 )
+from integrations.payments import wait_confirmed
+from integrations.utils.metrics import WorkerProbe
 from integrations.wallet.helpers import get_wallet
 
 NO_CONFIRM_SLEEP = 5
+# Ожидание подтверждения оплаты между циклами; меньше redis_socket_timeout
+CONFIRMED_WAIT_MS = 3_000
 
 
 def check_transaction_worker():
     toncenter = TonCenter(settings.toncenter_key.get_secret_value())
+    probe = WorkerProbe("check_transaction_worker")
     while threading.main_thread().is_alive():
+        probe.beat()
         try:
             orders = Order.objects.filter(status=Order.Status.BLOCKCHAIN_WAITING)
         except Exception:
@@ -96,14 +102,18 @@ def check_transaction_worker():
                 #     notify_about_success(order)
                 # except Exception:
                 #     logger.exception("")
+        probe.done(len(orders))
         time.sleep(2)
 
 
 def send_transaction_worker():
     wallet = get_wallet()
     fragment = FragmentAPI(wallet)
+    probe = WorkerProbe("send_transaction_worker")
+    last_event = None
 
     while threading.main_thread().is_alive():
+        probe.beat()
         try:
             orders = Order.objects.filter(
                 status=Order.Status.CREATED, payment__status=Payment.Status.CONFIRMED
@@ -228,4 +238,5 @@ def send_transaction_worker():
                 order.status = order.Status.BLOCKCHAIN_WAITING
                 order.take_in_work = timezone.now()
                 order.save()
-        time.sleep(3)
+        probe.done(len(orders))
+        last_event = wait_confirmed(last_event, CONFIRMED_WAIT_MS)
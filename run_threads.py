@@ -1,24 +1,33 @@
-import threading
-import time
-
 from fastapi_stars.scripts import init_django  # noqa: F401
 
 
 def start():
+    from integrations.Currencies import rates_feeder_worker
     from integrations.payments.ton_deposit import check_ton_deposits
     from integrations.workers import (
         send_transaction_worker,
         check_transaction_worker,
         gifts_worker,
+        merchant_webhooks_worker,
+        price_table_worker,
+        guest_claims_worker,
+        guest_cleanup_worker,
     )
+    from integrations.workers.supervisor import supervise
 
-    threading.Thread(target=check_ton_deposits, daemon=True).start()
-    threading.Thread(target=send_transaction_worker, daemon=True).start()
-    threading.Thread(target=check_transaction_worker, daemon=True).start()
-    threading.Thread(target=gifts_worker, daemon=True).start()
-
-    while True:
-        time.sleep(10)
+    supervise(
+        (
+            rates_feeder_worker,
+            price_table_worker,
+            check_ton_deposits,
+            send_transaction_worker,
+            check_transaction_worker,
+            gifts_worker,
+            merchant_webhooks_worker,
+            guest_claims_worker,
+            guest_cleanup_worker,
+        )
+    )
 
 
 if __name__ == "__main__":
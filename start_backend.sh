@@ -1,3 +1,7 @@
+# Метрики всех воркеров gunicorn для /metrics; каталог очищается при каждом старте
+export PROMETHEUS_MULTIPROC_DIR=/dev/shm/stars_site_metrics
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 .venv/bin/gunicorn fastapi_stars.main:app \
   --bind 127.0.0.1:3903 \
   --worker-class uvicorn.workers.UvicornWorker\